@@ -0,0 +1,249 @@
+""" Benchmarks for the folder and content hot paths, on a tree in a local
+FileStorage. Every operation runs on a cold connection, and reports the
+median time, the number of objects loaded from the storage and the peak
+memory allocated.
+
+    python benchmarks/bench_folders.py [--fanout N] [--depth N]
+        [--folder-class base|btree] [--catalog] [--save FILE]
+        [--compare FILE]
+
+--compare exits with status 1 when an operation got slower, or loads
+more objects or memory, than the baseline allows for. Baselines depend on the
+machine, so save one before making changes, and compare after.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import transaction
+from pyramid import testing
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from w20e.hitman.catalog import install_catalog
+from w20e.hitman.models.base import BaseContent, BaseFolder, BTreeFolder
+from w20e.hitman.utils import path_to_object
+
+FOLDER_CLASSES = {"base": BaseFolder, "btree": BTreeFolder}
+
+# number of adds in the add_content operation
+ADDS = 10
+
+
+def build_tree(db, clazz, fanout, depth, catalog=False):
+
+    """ Store a tree with fanout children per folder. Folders go depth
+    levels deep, the deepest folders hold content. If catalog is set,
+    the root gets a catalog first. Return the path of the first deepest
+    folder. """
+
+    conn = db.open()
+    root = conn.root()["root"] = clazz("root")
+
+    if catalog:
+        install_catalog(root)
+
+    level = [root]
+
+    for i in range(depth):
+        below = []
+
+        for folder in level:
+            for j in range(fanout):
+                if i < depth - 1:
+                    content = clazz(folder.generate_content_id("folder"))
+                    below.append(content)
+                else:
+                    content = BaseContent(folder.generate_content_id("basecontent"))
+
+                folder.add_content(content, emit_event=False)
+
+            transaction.savepoint(True)
+
+        level = below or level
+
+    transaction.commit()
+    path = level[0].path
+    conn.close()
+
+    return "/" + "/".join(path)
+
+
+def operations(folder_path):
+
+    """ Return (name, function) for the operations, each function takes
+    the root """
+
+    def folder(root):
+        return path_to_object(folder_path, root)
+
+    def add_content(root):
+        target = folder(root)
+
+        for i in range(ADDS):
+            content_id = target.generate_content_id("added")
+            target.add_content(BaseContent(content_id), emit_event=False)
+
+    def rename_content(root):
+        target = folder(root)
+        target.rename_content(target._list_content_ids()[0], "renamed")
+
+    return [
+        ("add_content", add_content),
+        ("list_content", lambda root: folder(root).list_content()),
+        ("_list_content_ids", lambda root: folder(root)._list_content_ids()),
+        ("find_content", lambda root: root.find_content()),
+        (
+            "generate_content_id",
+            lambda root: folder(root).generate_content_id("basecontent"),
+        ),
+        ("rename_content", rename_content),
+        ("path_to_object", folder),
+    ]
+
+
+def measure(db, func, repeat):
+
+    """ Run func on a cold connection, repeat times for the median time,
+    and once more for the loads and peak memory """
+
+    def run():
+        db.cacheMinimize()
+        conn = db.open()
+        conn.getTransferCounts(True)
+
+        start = time.perf_counter()
+        func(conn.root()["root"])
+        seconds = time.perf_counter() - start
+
+        loads, _stores = conn.getTransferCounts(True)
+        transaction.abort()
+        conn.close()
+
+        return seconds, loads
+
+    times = sorted([run()[0] for i in range(repeat)])
+
+    tracemalloc.start()
+    _seconds, loads = run()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": times[len(times) // 2], "loads": loads, "memory": peak}
+
+
+def compare(results, baseline, tolerance):
+
+    """ Return the operations that regressed, as messages """
+
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        base = baseline.get(name, None)
+
+        if base is None:
+            continue
+
+        for key in ("seconds", "loads", "memory"):
+            if result[key] > base[key] * tolerance and result[key] > base[key] + 1:
+                regressions.append(
+                    "%s: %s %s, baseline %s" % (name, key, result[key], base[key])
+                )
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--fanout", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--folder-class", choices=sorted(FOLDER_CLASSES), default="base"
+    )
+    parser.add_argument(
+        "--catalog", action="store_true", help="install a catalog on the root"
+    )
+    parser.add_argument("--save", metavar="FILE", help="store results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.5,
+        help="allowed ratio to the baseline, default 1.5",
+    )
+    args = parser.parse_args()
+
+    # a registry without subscribers, to dispatch events to
+    testing.setUp()
+
+    tmpdir = tempfile.mkdtemp()
+    db = DB(FileStorage(os.path.join(tmpdir, "Data.fs")))
+
+    try:
+        folder_path = build_tree(
+            db,
+            FOLDER_CLASSES[args.folder_class],
+            args.fanout,
+            args.depth,
+            catalog=args.catalog,
+        )
+
+        results = {}
+
+        for name, func in operations(folder_path):
+            results[name] = measure(db, func, args.repeat)
+    finally:
+        db.close()
+        shutil.rmtree(tmpdir)
+
+    print("%-20s %12s %8s %12s" % ("operation", "ms", "loads", "memory kB"))
+
+    for name, result in sorted(results.items()):
+        print(
+            "%-20s %12.3f %8d %12.1f"
+            % (name, result["seconds"] * 1000, result["loads"], result["memory"] / 1024)
+        )
+
+    params = {
+        "fanout": args.fanout,
+        "depth": args.depth,
+        "folder_class": args.folder_class,
+        "catalog": args.catalog,
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {"params": params, "results": results}, f, indent=2, sort_keys=True
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        if baseline["params"] != params:
+            print("baseline was made with %s" % baseline["params"])
+            return 2
+
+        regressions = compare(results, baseline["results"], args.tolerance)
+
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+""" Cost of id normalization, and of adding content with generated ids,
+with plain slugify and with the cached normalize_id.
+
+    python benchmarks/bench_normalize_id.py [-n NUMBER]
+"""
+
+import argparse
+import timeit
+
+from slugify import slugify
+
+from w20e.hitman.models.base import BaseContent, BaseFolder
+from w20e.hitman.utils import normalize_id
+
+IDS = ["basecontent", "document", "news-item", "Dôcument 1", "Wat's up?"]
+
+
+class SlugifyFolder(BaseFolder):
+
+    """ Folder normalizing ids the way it was done before """
+
+    def _normalize_id(self, id):
+        return slugify(id)
+
+
+def add_content(clazz, number):
+
+    folder = clazz("folder")
+
+    for i in range(number):
+        content_id = folder.generate_content_id(IDS[i % len(IDS)])
+        folder.add_content(BaseContent(content_id), emit_event=False)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, func in [("slugify", slugify), ("normalize_id", normalize_id)]:
+        seconds = timeit.timeit(
+            lambda: [func(content_id) for content_id in IDS], number=args.number
+        )
+        print(
+            "%-14s %8.2f us per id"
+            % (name, seconds * 1e6 / (args.number * len(IDS)))
+        )
+
+    for name, clazz in [("slugify", SlugifyFolder), ("normalize_id", BaseFolder)]:
+        seconds = timeit.timeit(lambda: add_content(clazz, args.number), number=1)
+        print("%-14s %8.2f us per add" % (name, seconds * 1e6 / args.number))
+
+
+if __name__ == "__main__":
+    main()
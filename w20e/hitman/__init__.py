@@ -1 +1,38 @@
 """ Being there """
+
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+def includeme(config):
+
+    """ Pyramid configuration, through config.include('w20e.hitman').
+    Unless hitman.warmup is false, the edit forms of all registered
+    content types are compiled when the application is created, and the
+    time per type is logged. Set hitman.warmup.validate to also check
+    the forms for binds to unknown fields """
+
+    # imported here, so importing any w20e.hitman module doesn't load the
+    # models and everything they need
+    from pyramid.events import ApplicationCreated
+    from pyramid.settings import asbool
+
+    from .models import Registry
+
+    settings = config.get_settings()
+
+    if not asbool(settings.get("hitman.warmup", True)):
+        return
+
+    validate = asbool(settings.get("hitman.warmup.validate", False))
+
+    def warmup(event):
+
+        timings = Registry.warmup(validate=validate)
+
+        for name, seconds in sorted(timings.items()):
+            log.info("compiled form for %s in %.1f ms", name, seconds * 1000)
+
+    config.add_subscriber(warmup, ApplicationCreated)
@@ -0,0 +1,295 @@
+""" Asynchronous event subscribers. Events for these subscribers are
+queued with the transaction, and handed to a worker thread pool once the
+transaction committed; events of failed or aborted transactions are
+dropped. The worker needs the database, to load the objects of the
+events in its own connection. """
+
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import update_wrapper
+
+import transaction
+from persistent import Persistent
+
+
+log = logging.getLogger(__name__)
+
+RETRIES = 3
+
+# seconds to wait before a retry, times the number of the attempt
+RETRY_DELAY = 0.5
+
+_local = threading.local()
+_worker = None
+
+
+class Job(object):
+
+    """A subscriber with the event to call it with"""
+
+    def __init__(self, subscriber, event, retries=RETRIES):
+        self.subscriber = subscriber
+        self.event = event
+        self.retries = retries
+        self.oids = {}
+
+    def has_objects(self):
+        """Tell whether the event, or an event it batches, holds
+        persistent objects"""
+
+        return _has_objects(self.event)
+
+    def detach(self):
+        """Remember the oids of the persistent objects of the event, and
+        of the events it batches, to load them again in the connection
+        of the worker. Called after the commit, when new objects have
+        their oid. Return False if an object has no oid, so the event
+        can't be detached."""
+
+        self.oids = _oids(self.event)
+
+        return self.oids is not None
+
+    def run(self, db=None, delay=RETRY_DELAY):
+        """Call the subscriber, retrying on errors. If the event holds
+        persistent objects, the subscriber gets a copy of the event with
+        the objects loaded in a new connection of db, and its changes are
+        committed."""
+
+        for attempt in range(self.retries + 1):
+            try:
+                if not self.has_objects():
+                    self.subscriber(self.event)
+                else:
+                    self._run_in(db)
+
+                return True
+            except Exception:
+                if attempt == self.retries:
+                    log.exception(
+                        "asynchronous subscriber %r failed for %r",
+                        self.subscriber,
+                        self.event,
+                    )
+                else:
+                    time.sleep(delay * (attempt + 1))
+
+        return False
+
+    def _run_in(self, db):
+        # the transaction manager of this thread, so events notified by
+        # the subscriber are queued with its transaction
+        tm = transaction.manager
+        conn = db.open(tm)
+
+        try:
+            tm.begin()
+            self.subscriber(_load(self.event, self.oids, conn))
+            tm.commit()
+        except Exception:
+            tm.abort()
+            raise
+        finally:
+            conn.close()
+
+
+class Worker(object):
+
+    """Thread pool running jobs. With one thread, the default, jobs run
+    in the order their transactions committed."""
+
+    def __init__(self, db, max_workers=1, delay=RETRY_DELAY):
+        if db is None:
+            raise ValueError("the worker needs a database")
+
+        self.db = db
+        self.delay = delay
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hitman-background"
+        )
+
+    def submit(self, job):
+        return self._executor.submit(job.run, self.db, self.delay)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def start_worker(db, max_workers=1, delay=RETRY_DELAY):
+    """Start the worker for queued events, running subscribers on the
+    objects of db in their own connection and transaction. Without a
+    worker, only events without persistent objects can be queued; they
+    are handled right after the commit, in the thread that committed."""
+
+    global _worker
+
+    stop_worker()
+    _worker = Worker(db=db, max_workers=max_workers, delay=delay)
+
+    return _worker
+
+
+def stop_worker(wait=True):
+    """Stop the worker, by default after the queued jobs are done"""
+
+    global _worker
+
+    worker, _worker = _worker, None
+
+    if worker is not None:
+        worker.shutdown(wait=wait)
+
+
+def queue_event(subscriber, event, retries=RETRIES):
+    """Queue event for subscriber, until the current transaction commits.
+    Without a worker, events holding persistent objects are logged and
+    dropped: the connection they come from can't be used once the
+    transaction is over."""
+
+    job = Job(subscriber, event, retries)
+
+    if _worker is None and job.has_objects():
+        log.error("no worker for %r, dropped %r", subscriber, event)
+        return
+
+    txn = transaction.get()
+    pending = getattr(_local, "pending", None)
+
+    if pending is not None and pending[0] is txn:
+        jobs = pending[1]
+    else:
+        jobs = []
+        _local.pending = (txn, jobs)
+        txn.addAfterCommitHook(_after_commit, (jobs,))
+
+    jobs.append(job)
+
+
+def async_subscriber(subscriber, retries=RETRIES):
+    """Wrap subscriber, so it is called asynchronously after the commit:
+
+        config.add_subscriber(async_subscriber(reindex), IObjectChangedEvent)
+    """
+
+    def queue(event):
+        queue_event(subscriber, event, retries)
+
+    if hasattr(subscriber, "__name__"):
+        update_wrapper(queue, subscriber)
+
+    return queue
+
+
+def add_async_subscriber(config, subscriber, iface=None, retries=RETRIES):
+    """Pyramid directive, config.add_async_subscriber(subscriber, iface)"""
+
+    subscriber = config.maybe_dotted(subscriber)
+    config.add_subscriber(async_subscriber(subscriber, retries), iface)
+
+
+def includeme(config):
+    """Add the add_async_subscriber directive, through
+    config.include('w20e.hitman.background'). The worker is not started
+    here, as it needs the database: call start_worker(db) once the
+    database is opened."""
+
+    config.add_directive("add_async_subscriber", add_async_subscriber)
+
+
+def _after_commit(status, jobs):
+    _local.pending = None
+
+    if not status:
+        return
+
+    worker = _worker
+
+    for job in jobs:
+        if not job.has_objects():
+            if worker is None:
+                job.run(delay=0)
+            else:
+                worker.submit(job)
+        elif worker is None:
+            # the worker was stopped since the event was queued
+            log.error("no worker for %r, dropped %r", job.subscriber, job.event)
+        elif not job.detach():
+            log.error("can't detach %r for %r, dropped", job.event, job.subscriber)
+        else:
+            worker.submit(job)
+
+
+def _events(value):
+    """The events batched in value, e.g. ContentEventsBatched.events, or
+    an empty list if value is not a list of events"""
+
+    if isinstance(value, (list, tuple)) and all(
+        hasattr(item, "__dict__") and not isinstance(item, Persistent)
+        for item in value
+    ):
+        return value
+
+    return []
+
+
+def _has_objects(event):
+    for value in event.__dict__.values():
+        if isinstance(value, Persistent):
+            return True
+
+        if isinstance(value, (list, tuple)):
+            if any(isinstance(item, Persistent) for item in value):
+                return True
+
+            if any(_has_objects(item) for item in _events(value)):
+                return True
+
+    return False
+
+
+def _oids(event):
+    """Return the oids of the persistent objects of event by attribute,
+    with a list of those of every event for lists of events, or None if
+    an object can't be detached"""
+
+    oids = {}
+
+    for name, value in event.__dict__.items():
+        if isinstance(value, Persistent):
+            if value._p_oid is None:
+                return None
+
+            oids[name] = value._p_oid
+        elif isinstance(value, (list, tuple)):
+            if any(isinstance(item, Persistent) for item in value):
+                return None
+
+            events = _events(value)
+
+            if any(_has_objects(item) for item in events):
+                nested = [_oids(item) for item in events]
+
+                if None in nested:
+                    return None
+
+                oids[name] = nested
+
+    return oids
+
+
+def _load(event, oids, conn):
+    """Return a copy of event with the objects of oids loaded in conn"""
+
+    event = copy.copy(event)
+
+    for name, oid in oids.items():
+        if isinstance(oid, list):
+            nested = zip(getattr(event, name), oid)
+            setattr(event, name, [_load(item, o, conn) for item, o in nested])
+        else:
+            setattr(event, name, conn.get(oid))
+
+    return event
@@ -0,0 +1,306 @@
+""" Site wide catalog of content by path, type, owner and dates """
+
+import random
+
+from BTrees.IIBTree import IISet, IITreeSet, intersection, multiunion
+from BTrees.IOBTree import IOBTree
+from BTrees.Length import Length
+from BTrees.OIBTree import OIBTree
+from BTrees.OOBTree import OOBTree
+from persistent import Persistent
+
+from .events import IContentEventsBatchedEvent, IObjectChangedEvent
+from .models.base import IFolder
+
+
+MAX_DOCID = 2**31 - 1
+
+
+class Catalog(Persistent):
+
+    """Catalog of all content below the root it is installed on. Content
+    is indexed on dotted path, content type, owner, created and
+    changed. All indexes are BTrees, so subtree and type queries are
+    range scans instead of walking the tree."""
+
+    def __init__(self):
+        Persistent.__init__(self)
+        self._paths = OIBTree()
+        self._docs = IOBTree()
+        self._objects = IOBTree()
+        self._meta = IOBTree()
+        self._types = OOBTree()
+        self._owners = OOBTree()
+        self._created = OOBTree()
+        self._changed = OOBTree()
+        self._length = Length()
+
+    def __len__(self):
+        return self._length()
+
+    def __bool__(self):
+        return True
+
+    def is_indexed(self, obj):
+        return self._docid(obj) is not None
+
+    def index(self, obj):
+        """Index or reindex obj. If obj is a folder that moved to
+        another path, the paths of its descendants move along."""
+
+        path = obj.dottedpath
+        docid = self._docid(obj)
+
+        if docid is None:
+            docid = self._new_docid()
+            obj._docid = docid
+            self._length.change(1)
+        else:
+            self._unindex_meta(docid)
+            old_path = self._docs[docid]
+
+            if old_path != path:
+                if self._paths.get(old_path, None) == docid:
+                    del self._paths[old_path]
+                self._move_prefix(old_path, path)
+
+        stale = self._paths.get(path, None)
+
+        if stale is not None and stale != docid:
+            self._unindex_docid(stale)
+
+        self._paths[path] = docid
+        self._docs[docid] = path
+        self._objects[docid] = obj
+
+        meta = (obj.content_type, obj.owner, obj.created, obj.changed)
+        self._meta[docid] = meta
+
+        for index, value in zip(self._field_indexes, meta):
+            docids = index.get(value, None)
+
+            if docids is None:
+                docids = index[value] = IITreeSet()
+
+            docids.insert(docid)
+
+    def index_subtree(self, obj):
+        """Index obj and, if it is a folder, everything below it"""
+
+        self.index(obj)
+
+        if IFolder.providedBy(obj):
+            for child in obj.values():
+                self.index_subtree(child)
+
+    def unindex(self, obj):
+        docid = self._docid(obj)
+
+        if docid is None:
+            docid = self._paths.get(obj.dottedpath, None)
+
+            if docid is None or self._objects.get(docid, None) is not obj:
+                return
+
+        self._unindex_docid(docid)
+
+    def unindex_path(self, path):
+        """Unindex the object at dotted path and everything below it"""
+
+        for docid in list(self._path_docids(path)):
+            self._unindex_docid(docid)
+
+    def move_path(self, old_path, new_path):
+        """Move the object at old_path, and everything below it, to
+        new_path. This only rewrites the path index."""
+
+        docid = self._paths.get(old_path, None)
+
+        if docid is not None:
+            stale = self._paths.get(new_path, None)
+
+            if stale is not None and stale != docid:
+                self._unindex_docid(stale)
+
+            del self._paths[old_path]
+            self._paths[new_path] = docid
+            self._docs[docid] = new_path
+
+        self._move_prefix(old_path, new_path)
+
+    def search(
+        self,
+        path=None,
+        content_type=None,
+        owner=None,
+        created=None,
+        changed=None,
+        include_path=True,
+    ):
+        """Return the set of docids matching all given criteria. Path
+        matches the subtree below that dotted path, content_type and
+        owner may be a single value or a list, created and changed are
+        (min, max) tuples where either may be None."""
+
+        result = None
+
+        if path is not None:
+            result = self._path_docids(path, include_path=include_path)
+
+        if content_type is not None:
+            result = intersection(result, self._value_docids(self._types, content_type))
+
+        if owner is not None:
+            result = intersection(result, self._value_docids(self._owners, owner))
+
+        if created is not None:
+            result = intersection(result, self._range_docids(self._created, created))
+
+        if changed is not None:
+            result = intersection(result, self._range_docids(self._changed, changed))
+
+        if result is None:
+            result = IISet(self._docs.keys())
+
+        return result
+
+    def query(self, **kwargs):
+        """Search and return the matching objects, ordered by path"""
+
+        docids = self.search(**kwargs)
+        paths = sorted(self._docs[docid] for docid in docids)
+
+        return [self._objects[self._paths[path]] for path in paths]
+
+    def get_object(self, path):
+        """Return the object indexed at dotted path, or None"""
+
+        docid = self._paths.get(path, None)
+
+        if docid is None:
+            return None
+
+        return self._objects.get(docid, None)
+
+    @property
+    def _field_indexes(self):
+        return (self._types, self._owners, self._created, self._changed)
+
+    def _docid(self, obj):
+        docid = getattr(obj, "_docid", None)
+
+        if docid is None or self._objects.get(docid, None) is not obj:
+            return None
+
+        return docid
+
+    def _new_docid(self):
+        while True:
+            docid = random.randint(0, MAX_DOCID)
+
+            if docid not in self._docs:
+                return docid
+
+    def _move_prefix(self, old_path, new_path):
+        old_prefix = old_path + "."
+
+        for path, docid in list(
+            self._paths.items(min=old_prefix, max=old_prefix + "\uffff")
+        ):
+            moved = new_path + path[len(old_path) :]
+            del self._paths[path]
+            self._paths[moved] = docid
+            self._docs[docid] = moved
+
+    def _unindex_meta(self, docid):
+        meta = self._meta.pop(docid, None)
+
+        if meta is None:
+            return
+
+        for index, value in zip(self._field_indexes, meta):
+            docids = index.get(value, None)
+
+            if docids is not None and docid in docids:
+                docids.remove(docid)
+
+                if not docids:
+                    del index[value]
+
+    def _unindex_docid(self, docid):
+        self._unindex_meta(docid)
+
+        path = self._docs.pop(docid, None)
+
+        if path is not None and self._paths.get(path, None) == docid:
+            del self._paths[path]
+
+        self._objects.pop(docid, None)
+        self._length.change(-1)
+
+    def _path_docids(self, path, include_path=True):
+        prefix = path if path.endswith(".") else path + "."
+        docids = IISet(self._paths.values(min=prefix, max=prefix + "\uffff"))
+
+        if include_path and path in self._paths:
+            docids.insert(self._paths[path])
+
+        return docids
+
+    def _value_docids(self, index, values):
+        if isinstance(values, str):
+            values = [values]
+
+        return multiunion([index[value] for value in values if value in index])
+
+    def _range_docids(self, index, value_range):
+        low, high = value_range
+
+        return multiunion(list(index.values(min=low, max=high)))
+
+
+def get_catalog(obj):
+    """Return the catalog installed on the root of obj, if any"""
+
+    return getattr(obj.root, "_catalog", None)
+
+
+def install_catalog(root):
+    """Install a catalog on root and index all existing content"""
+
+    catalog = Catalog()
+
+    for child in root.values():
+        catalog.index_subtree(child)
+
+    root._catalog = catalog
+
+    return catalog
+
+
+def content_changed(event):
+    catalog = get_catalog(event.object)
+
+    # content that is not cataloged was removed, or is not in the site
+    if catalog is not None and catalog.is_indexed(event.object):
+        catalog.index(event.object)
+
+
+def events_batched(event):
+    """Handle batches that were not dispatched event by event"""
+
+    if event.dispatched:
+        return
+
+    for content_event in event.events:
+        if IObjectChangedEvent.providedBy(content_event):
+            content_changed(content_event)
+
+
+def includeme(config):
+    """Keep the owner and dates in catalogs current on ContentChanged,
+    through config.include('w20e.hitman.catalog'). Adding, moving and
+    removing content is cataloged by the folders themselves."""
+
+    config.add_subscriber(content_changed, IObjectChangedEvent)
+    config.add_subscriber(events_batched, IContentEventsBatchedEvent)
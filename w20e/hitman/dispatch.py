@@ -0,0 +1,225 @@
+""" Event dispatch for hitman content events, with batching """
+
+import threading
+import time
+from contextlib import contextmanager
+from itertools import groupby
+
+import transaction
+from zope.component import getSiteManager
+
+from .events import ContentChanged, ContentEventsBatched, PathChanged
+from .instrumentation import current, notify_timed
+from .profiling import get_profile
+
+
+_local = threading.local()
+
+
+class EventBatch(object):
+
+    """Collects events and coalesces repeated events on the same object,
+    e.g. many ContentChanged for one object end up as one. Flushing the
+    batch dispatches the remaining events, followed by a single
+    ContentEventsBatched event holding all of them.
+
+    Every event remembers whether it is dispatched one by one, so events
+    merged in from a batch with other settings keep theirs. Flushing
+    then sends a ContentEventsBatched per run of events with the same
+    setting."""
+
+    def __init__(self, registry=None, dispatch_events=True):
+        self.registry = registry
+        self.dispatch_events = dispatch_events
+        self.events = []
+        self._queued = {}
+        self._quiet = set()
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event, dispatch=None):
+        """Add event, to be dispatched one by one if dispatch is set,
+        which defaults to the setting of the batch"""
+
+        if dispatch is None:
+            dispatch = self.dispatch_events
+
+        key = self._key(event)
+        queued = None if key is None else self._queued.get(key, None)
+
+        if queued is None:
+            if key is not None:
+                self._queued[key] = event
+
+            self.events.append(event)
+
+            if not dispatch:
+                self._quiet.add(id(event))
+
+            return
+
+        if dispatch:
+            # coalesced with an event that is dispatched
+            self._quiet.discard(id(queued))
+
+        if isinstance(event, PathChanged):
+            # keep the first old path and the last new path
+            queued.new_path = event.new_path
+
+            if hasattr(event, "parent"):
+                queued.parent = event.parent
+        elif isinstance(event, ContentChanged):
+            # changed fields add up, unknown means all fields
+            if queued.fields is not None:
+                if event.fields is None:
+                    queued.fields = None
+                else:
+                    queued.fields = queued.fields | event.fields
+
+    def merge(self, batch):
+        """Add the events of batch, keeping their dispatch setting"""
+
+        for event in batch.events:
+            self.add(event, dispatch=id(event) not in batch._quiet)
+
+    def flush(self):
+        events = self.events
+        quiet = self._quiet
+        self.events = []
+        self._queued = {}
+        self._quiet = set()
+
+        if not events:
+            return
+
+        registry = self.registry or getSiteManager()
+
+        for dispatched, run in groupby(events, lambda event: id(event) not in quiet):
+            run = list(run)
+
+            if dispatched:
+                for event in run:
+                    _dispatch(registry, event)
+
+            _dispatch(registry, ContentEventsBatched(run, dispatched=dispatched))
+
+    def _key(self, event):
+        obj = getattr(event, "object", None)
+
+        if obj is None:
+            return None
+
+        if isinstance(event, (ContentChanged, PathChanged)):
+            return (event.__class__, id(obj))
+
+        return (event.__class__, id(obj), id(getattr(event, "parent", None)))
+
+
+def notify(event, registry=None):
+    """Dispatch event, or queue it if batching is active"""
+
+    batches = getattr(_local, "batches", None)
+
+    if batches:
+        batches[-1].add(event)
+        return
+
+    deferred = _deferred_batch()
+
+    if deferred is not None:
+        deferred.add(event)
+        return
+
+    _dispatch(registry or getSiteManager(), event)
+
+
+def _dispatch(registry, event):
+    stats = current()
+    profile = get_profile()
+
+    if stats is None and profile is None:
+        registry.notify(event)
+        return
+
+    recorders = []
+
+    if stats is not None:
+        recorders.append(stats.add_subscriber)
+
+    if profile is not None:
+        recorders.append(profile.record)
+
+    start = time.perf_counter()
+    notify_timed(registry, event, recorders)
+
+    if stats is not None:
+        stats.add_event(event, time.perf_counter() - start)
+
+
+@contextmanager
+def batch_events(registry=None, dispatch_events=True):
+    """Collect all events notified within the block, and dispatch them
+    when the block exits. If the block raises, the events are dropped.
+    Nested batches hand their events to the outer batch, and batches
+    within defer_events to the queue of the transaction. With
+    dispatch_events off, only the ContentEventsBatched event is sent,
+    also when the events are handed on."""
+
+    batch = EventBatch(registry=registry, dispatch_events=dispatch_events)
+    batches = _local.__dict__.setdefault("batches", [])
+    batches.append(batch)
+
+    try:
+        yield batch
+    finally:
+        batches.pop()
+
+    if batches:
+        outer = batches[-1]
+    else:
+        outer = _deferred_batch()
+
+    if outer is None:
+        batch.flush()
+    else:
+        outer.merge(batch)
+
+
+def defer_events(registry=None, dispatch_events=True):
+    """Queue all events until the current transaction commits, and
+    dispatch them just before the commit so subscribers still take part
+    in it. An aborted transaction drops the queue."""
+
+    txn = transaction.get()
+    deferred = getattr(_local, "deferred", None)
+
+    if deferred is not None and deferred[0] is txn:
+        return deferred[1]
+
+    batch = EventBatch(registry=registry, dispatch_events=dispatch_events)
+    _local.deferred = (txn, batch)
+
+    def flush():
+        _local.deferred = None
+        batch.flush()
+
+    txn.addBeforeCommitHook(flush)
+
+    return batch
+
+
+def _deferred_batch():
+    deferred = getattr(_local, "deferred", None)
+
+    if deferred is None:
+        return None
+
+    txn, batch = deferred
+
+    if txn is not transaction.get():
+        # the transaction was aborted
+        _local.deferred = None
+        return None
+
+    return batch
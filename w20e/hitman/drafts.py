@@ -0,0 +1,107 @@
+""" Drafts of multipage forms """
+
+import json
+import time
+
+from .utils import json_decode, json_encode
+
+SESSION_KEY = "w20e.hitman.drafts"
+
+# seconds after which an untouched draft is stale
+MAX_AGE = 3600
+
+
+class Drafts(object):
+
+    """Data of multipage forms that are being filled in, keyed by the
+    path of the content. Drafts live in the session of the request, so
+    whichever process serves the next page finds them, and not on the
+    content, so filling in a form doesn't write to the database. Values
+    are stored JSON encoded, with dates and datetimes tagged, so any
+    session serializer can store them. A cookie based session limits
+    the size of the drafts; use a server side session for large forms."""
+
+    def __init__(self, request, max_age=MAX_AGE):
+        self.max_age = max_age
+        self.session = request.session
+        self._drafts = self.session.setdefault(SESSION_KEY, {})
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        """Return the draft data for key, or None if there is no draft or
+        the draft is stale"""
+
+        try:
+            stamp, encoded = self._drafts[key]
+        except KeyError:
+            return None
+
+        if stamp < time.time() - self.max_age:
+            return None
+
+        return json.loads(encoded, object_hook=json_decode)
+
+    def set(self, key, data):
+        """Store data as the draft for key, and clean up stale drafts"""
+
+        self._drafts[key] = [time.time(), json.dumps(data, default=json_encode)]
+        self.cleanup()
+
+    def remove(self, key):
+        if self._drafts.pop(key, None) is not None:
+            self.session.changed()
+
+    def cleanup(self, max_age=None):
+        """Remove drafts older than max_age seconds, defaulting to the
+        max_age of the store. Return the number of removed drafts."""
+
+        if max_age is None:
+            max_age = self.max_age
+
+        limit = time.time() - max_age
+        stale = [key for key, (stamp, _data) in self._drafts.items() if stamp < limit]
+
+        for key in stale:
+            del self._drafts[key]
+
+        self.session.changed()
+
+        return len(stale)
+
+
+class ContentDrafts(object):
+
+    """Drafts for requests without a session, kept on the content in
+    _cloned_data as before drafts moved to the session. Each page of the
+    form then writes to the database. The content has one draft, so the
+    key is ignored."""
+
+    def __init__(self, context):
+        self.context = context
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        return getattr(self.context, "_cloned_data", None)
+
+    def set(self, key, data):
+        self.context._cloned_data = data
+
+    def remove(self, key):
+        if hasattr(self.context, "_cloned_data"):
+            del self.context._cloned_data
+
+
+def get_drafts(request, context):
+    """Return the drafts for a form on context: in the session if the
+    request has one, on the content otherwise"""
+
+    try:
+        request.session
+    except AttributeError:
+        return ContentDrafts(context)
+
+    return Drafts(request)
@@ -1,6 +1,6 @@
 
 from zope.interface.interfaces import IObjectEvent
-from zope.interface import implementer, Attribute
+from zope.interface import implementer, Attribute, Interface
 
 
 class ObjectEvent(object):
@@ -33,6 +33,33 @@ class IObjectChangedEvent(IObjectEvent):
 
     """Interface for changed objects"""
 
+    fields = Attribute("The names of the changed data fields, None if unknown")
+
+
+class IObjectPathChangedEvent(IObjectEvent):
+
+    """Interface for objects that got another path. The path of all
+    their descendants changed along"""
+
+    old_path = Attribute("The old dotted path of the object")
+    new_path = Attribute("The new dotted path of the object")
+
+
+class IObjectMovedEvent(IObjectPathChangedEvent):
+
+    """Interface for objects moved to another folder"""
+
+    old_parent = Attribute("The folder the object was moved from")
+    parent = Attribute("The folder the object was moved to")
+
+
+class IContentEventsBatchedEvent(Interface):
+
+    """Interface for a batch of content events"""
+
+    events = Attribute("The events in the batch, in order")
+    dispatched = Attribute("Whether the events were dispatched one by one")
+
 
 class IObjectCopiedEvent(IObjectEvent):
 
@@ -59,8 +86,31 @@ class ContentChanged(ObjectEvent):
 
     """Object is changed"""
 
-    def __init__(self, object):
+    def __init__(self, object, fields=None):
         self.object = object
+        self.fields = fields if fields is None else frozenset(fields)
+
+
+@implementer(IObjectPathChangedEvent)
+class PathChanged(ObjectEvent):
+
+    """Object and its descendants got another path"""
+
+    def __init__(self, object, old_path, new_path):
+        self.object = object
+        self.old_path = old_path
+        self.new_path = new_path
+
+
+@implementer(IObjectMovedEvent)
+class ContentMoved(PathChanged):
+
+    """Object is moved to another folder"""
+
+    def __init__(self, object, old_parent, parent, old_path, new_path):
+        PathChanged.__init__(self, object, old_path, new_path)
+        self.old_parent = old_parent
+        self.parent = parent
 
 
 @implementer(IObjectCopiedEvent)
@@ -71,3 +121,13 @@ class ContentCopied(ObjectEvent):
     def __init__(self, object, source):
         self.object = object
         self.source = source
+
+
+@implementer(IContentEventsBatchedEvent)
+class ContentEventsBatched(object):
+
+    """Batch of events is dispatched"""
+
+    def __init__(self, events, dispatched=True):
+        self.events = events
+        self.dispatched = dispatched
@@ -0,0 +1,210 @@
+""" Streaming export and import of content trees, as JSON lines """
+
+import json
+import logging
+from datetime import date
+
+import transaction
+from pyramid.path import DottedNameResolver
+
+from .models import Registry
+from .models.base import Base, IContent
+from .utils import json_decode, json_encode
+
+
+log = logging.getLogger(__name__)
+
+# objects written between savepoints on import
+SAVEPOINT_EVERY = 1000
+
+_resolver = DottedNameResolver()
+
+
+def export_content(folder, stream):
+    """Write all content below folder to stream, one JSON object per
+    line. Folders come before their content, and the content of a folder
+    in its order. Every line has the path relative to folder, the
+    content type name from the Registry (or the dotted name of the class
+    for unregistered classes), the data, owner, created and changed.
+    Data values that can't be written as JSON, like blobs, are left out
+    and their names listed in skipped. Return the number of objects
+    written."""
+
+    names = dict((clazz, name) for name, clazz in Registry.content_types.items())
+    base = len(folder.path)
+    count = 0
+
+    for content in folder.iter_content(breadth_first=True):
+        clazz = content.__class__
+        name = names.get(clazz, None)
+
+        if name is None:
+            name = "%s.%s" % (clazz.__module__, clazz.__name__)
+
+        data, skipped = _export_data(content)
+
+        line = {
+            "path": content.path[base:],
+            "type": name,
+            "data": data,
+            "owner": content.owner,
+            "created": content.created,
+            "changed": content.changed,
+        }
+
+        if skipped:
+            log.warning("not exporting %s of %s", ", ".join(skipped), content.path)
+            line["skipped"] = skipped
+
+        stream.write(json.dumps(line, default=json_encode, sort_keys=True))
+        stream.write("\n")
+        count += 1
+
+    return count
+
+
+def import_content(folder, stream, emit_event=True, savepoint_every=SAVEPOINT_EVERY):
+    """Read content written by export_content from stream, and add it
+    below folder. Content of one folder is added in bulk, with
+    add_content_many; a savepoint is made every savepoint_every objects,
+    after which unchanged objects may leave the cache, so memory stays
+    bounded. Committing is up to the caller. Return the number of
+    objects read."""
+
+    parent_path = None
+    parent = None
+    batch = []
+    count = 0
+
+    for line in stream:
+        if not line.strip():
+            continue
+
+        item = json.loads(line, object_hook=json_decode)
+        path = tuple(item["path"][:-1])
+
+        if path != parent_path:
+            _add(parent, batch, emit_event)
+            batch = []
+            parent_path = path
+            parent = _resolve(folder, path)
+
+        batch.append(_create(item))
+        count += 1
+
+        if count % savepoint_every == 0:
+            _add(parent, batch, emit_event)
+            batch = []
+            _savepoint(folder)
+
+    _add(parent, batch, emit_event)
+
+    return count
+
+
+def _export_data(content):
+    """Return the exportable data of content, and the sorted names of
+    the fields left out"""
+
+    data = {}
+    skipped = []
+
+    for name, value in getattr(content, content.data_attr_name).items():
+        if _exportable(value):
+            data[name] = value
+        else:
+            skipped.append(name)
+
+    return data, sorted(skipped)
+
+
+def _exportable(value):
+    if value is None or isinstance(value, (str, int, float, date)):
+        return True
+
+    if isinstance(value, (list, tuple)):
+        return all(_exportable(item) for item in value)
+
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and _exportable(item) for key, item in value.items()
+        )
+
+    return False
+
+
+def _content_class(name):
+    """Return the content class for a type name from the Registry, or
+    the dotted name of a class. Anything but a content class is refused,
+    so an import file can't call arbitrary code."""
+
+    clazz = Registry.get(name)
+
+    if clazz is not None:
+        return clazz
+
+    try:
+        clazz = _resolver.resolve(name)
+    except (ImportError, ValueError):
+        clazz = None
+
+    if not (
+        isinstance(clazz, type)
+        and issubclass(clazz, Base)
+        and IContent.implementedBy(clazz)
+    ):
+        raise ValueError("unknown content type %r" % (name,))
+
+    return clazz
+
+
+def _content_id(path):
+    content_id = path[-1] if path else None
+
+    if (
+        not isinstance(content_id, str)
+        or not content_id
+        or content_id.startswith("_")
+        or "/" in content_id
+        or "." in content_id
+    ):
+        raise ValueError("invalid content id %r" % (content_id,))
+
+    return content_id
+
+
+def _create(item):
+    clazz = _content_class(item["type"])
+    content = clazz(_content_id(item["path"]))
+
+    getattr(content, content.data_attr_name).update(item["data"])
+
+    if item["owner"]:
+        content._owner = item["owner"]
+
+    content._created = item["created"]
+    content._changed = item["changed"]
+
+    return content
+
+
+def _resolve(folder, path):
+    for content_id in path:
+        folder = folder[content_id]
+
+    return folder
+
+
+def _add(parent, batch, emit_event):
+    if batch:
+        parent.add_content_many(batch, emit_event=emit_event)
+
+
+def _savepoint(folder):
+    transaction.savepoint(True)
+
+    jar = getattr(folder, "_p_jar", None)
+
+    if jar is not None:
+        jar.cacheGC()
+
@@ -0,0 +1,174 @@
+""" Process wide cache of compiled forms """
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from w20e.forms.form import Form
+from w20e.forms.formdata import FormData
+from w20e.forms.utils import find_file
+from w20e.forms.xml.factory import XMLFormFactory
+from w20e.forms.xml.formfile import FormFile
+
+from .instrumentation import current
+
+
+class FormTemplate(object):
+
+    """Compiled form: the model, view and submission of a parsed form,
+    that are shared by all forms created from the template, and the
+    default data as an immutable tuple. Creating a form only allocates
+    the data container. seconds is the time it took to parse the form."""
+
+    __slots__ = ("id", "model", "view", "submission", "defaults", "seconds")
+
+    def __init__(self, form, seconds=0.0):
+        self.id = form.id
+        self.model = form.model
+        self.view = form.view
+        self.submission = form.submission
+        self.defaults = tuple(form.data.as_dict().items())
+        self.seconds = seconds
+
+    def check(self):
+        """Return a list of problems with the form, i.e. binds to fields
+        that are not in the data"""
+
+        fields = set(field_id for field_id, _value in self.defaults)
+        problems = []
+
+        for prop in self.model.getAllFieldProperties():
+            for bind in prop.bind:
+                if bind not in fields:
+                    problems.append(
+                        "properties %s bind to unknown field %s" % (prop.id, bind)
+                    )
+
+        for renderable in self.view.getRenderables(recursive=True):
+            bind = getattr(renderable, "bind", None)
+
+            if bind and bind not in fields:
+                problems.append(
+                    "%s binds to unknown field %s" % (renderable.id, bind)
+                )
+
+        return problems
+
+    def new_form(self):
+        return Form(
+            self.id,
+            FormData(dict(self.defaults)),
+            self.model,
+            self.view,
+            self.submission,
+        )
+
+
+class FormCache(object):
+
+    """Thread safe LRU cache of form templates, keyed by content class,
+    form file and the modification time of that file, so a changed file
+    is parsed again."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def get_template(self, clazz, form_file=None):
+        """Return the template for clazz, compiled from form_file or the
+        edit_form of clazz"""
+
+        return self._get(clazz, form_file or clazz.edit_form)
+
+    def get_form(self, clazz, form_file=None):
+        """Return a new form for clazz"""
+
+        return self.get_template(clazz, form_file).new_form()
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get(self, clazz, form_file):
+        stats = current()
+
+        if stats is None:
+            return self._lookup(clazz, form_file)[0]
+
+        start = time.perf_counter()
+        template, hit = self._lookup(clazz, form_file)
+        stats.add_form(hit, time.perf_counter() - start)
+
+        return template
+
+    def _lookup(self, clazz, form_file):
+        """Return the template, and whether it was cached"""
+
+        filename = FormFile(find_file(form_file, clazz)).filename
+        key = (clazz, filename, os.path.getmtime(filename))
+
+        with self._lock:
+            template = self._templates.get(key, None)
+
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template, True
+
+        # parse outside of the lock, at worst a form is parsed twice
+        start = time.perf_counter()
+        form = XMLFormFactory(filename).create_form(action="")
+        template = FormTemplate(form, seconds=time.perf_counter() - start)
+
+        with self._lock:
+            self.misses += 1
+
+            # forget older versions of the file
+            for stale in [k for k in self._templates if k[:2] == key[:2]]:
+                del self._templates[stale]
+
+            self._templates[key] = template
+
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+
+        return template, False
+
+
+form_cache = FormCache()
+
+_field_info = weakref.WeakKeyDictionary()
+
+
+def field_info(form):
+    """Return a tuple of (bind, label, renderable type) for the labelled
+    fields of form. This is computed once per form view, and forms from
+    the same template share their view, so once per content type."""
+
+    try:
+        return _field_info[form.view]
+    except KeyError:
+        pass
+
+    info = []
+
+    for field in form.data.getFields():
+        renderable = form.view.getRenderableByBind(field)
+
+        if renderable and renderable.label:
+            info.append((field, renderable.label, renderable.type))
+
+    info = tuple(info)
+    _field_info[form.view] = info
+
+    return info
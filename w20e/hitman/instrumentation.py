@@ -0,0 +1,242 @@
+""" Per request instrumentation: objects loaded from the database, events
+dispatched and form cache use, with the time spent on each """
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from pyramid.settings import asbool
+from ZODB.Connection import Connection
+from zope.interface import providedBy
+
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Connection.setstate, before it was wrapped to time loads
+_setstate = None
+
+
+class RequestStats(object):
+
+    """Counters for one request. Dispatch and the form cache add to the
+    stats of the current thread while instrumentation is on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.stores = 0
+        self.events = Counter()
+        self.event_seconds = Counter()
+        self.subscribers = Counter()
+        self.subscriber_seconds = Counter()
+        self.form_hits = 0
+        self.form_misses = 0
+        self.form_seconds = 0.0
+
+    def add_load(self, seconds):
+        self.loads += 1
+        self.load_seconds += seconds
+
+    def add_event(self, event, seconds):
+        name = event.__class__.__name__
+        self.events[name] += 1
+        self.event_seconds[name] += seconds
+
+    def add_subscriber(self, event, subscriber, seconds):
+        self.subscribers[subscriber] += 1
+        self.subscriber_seconds[subscriber] += seconds
+
+    def add_form(self, hit, seconds):
+        if hit:
+            self.form_hits += 1
+        else:
+            self.form_misses += 1
+
+        self.form_seconds += seconds
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            "seconds": round(self.seconds, 6),
+            "loads": self.loads,
+            "load_seconds": round(self.load_seconds, 6),
+            "stores": self.stores,
+            "events": dict(self.events),
+            "event_seconds": _rounded(self.event_seconds),
+            "subscribers": dict(self.subscribers),
+            "subscriber_seconds": _rounded(self.subscriber_seconds),
+            "form_hits": self.form_hits,
+            "form_misses": self.form_misses,
+            "form_seconds": round(self.form_seconds, 6),
+        }
+
+    def headers(self):
+        return {
+            "X-Hitman-Time": "%.6f" % self.seconds,
+            "X-Hitman-Loads": str(self.loads),
+            "X-Hitman-Load-Time": "%.6f" % self.load_seconds,
+            "X-Hitman-Events": str(sum(self.events.values())),
+            "X-Hitman-Event-Time": "%.6f" % sum(self.event_seconds.values()),
+            "X-Hitman-Event-Times": _header_times(self.event_seconds),
+            "X-Hitman-Subscriber-Times": _header_times(self.subscriber_seconds),
+            "X-Hitman-Form-Hits": str(self.form_hits),
+            "X-Hitman-Form-Misses": str(self.form_misses),
+            "X-Hitman-Form-Time": "%.6f" % self.form_seconds,
+        }
+
+
+def current():
+    """Return the stats being collected in this thread, or None if
+    instrumentation is off"""
+
+    return getattr(_local, "stats", None)
+
+
+def start():
+    _local.stats = stats = RequestStats()
+
+    return stats
+
+
+def stop():
+    stats = current()
+    _local.stats = None
+
+    if stats is not None:
+        stats.stop()
+
+    return stats
+
+
+def instrumentation_tween_factory(handler, registry):
+    """Tween collecting RequestStats per request, if hitman.instrumentation
+    is set. The stats go to a JSON log line, unless
+    hitman.instrumentation.log is false, and to X-Hitman-* response
+    headers if hitman.instrumentation.headers is set. Turned off, the
+    tween is left out altogether.
+
+    Loads are counted and timed by wrapping Connection.setstate, once
+    instrumentation is on. Stores are counted on the connection of the
+    context, and cleared after each request."""
+
+    settings = registry.settings or {}
+
+    if not asbool(settings.get("hitman.instrumentation", False)):
+        return handler
+
+    instrument_loads()
+
+    use_log = asbool(settings.get("hitman.instrumentation.log", True))
+    use_headers = asbool(settings.get("hitman.instrumentation.headers", False))
+
+    def instrumentation_tween(request):
+        stats = start()
+
+        try:
+            response = handler(request)
+        finally:
+            stop()
+
+        jar = getattr(getattr(request, "context", None), "_p_jar", None)
+
+        if jar is not None:
+            _loads, stats.stores = jar.getTransferCounts(True)
+
+        if use_log:
+            data = stats.as_dict()
+            data["path"] = request.path
+            log.info(json.dumps(data, sort_keys=True))
+
+        if use_headers:
+            response.headers.update(stats.headers())
+
+        return response
+
+    return instrumentation_tween
+
+
+def includeme(config):
+    """Add the instrumentation tween, through
+    config.include('w20e.hitman.instrumentation')"""
+
+    config.add_tween("w20e.hitman.instrumentation.instrumentation_tween_factory")
+
+
+def instrument_loads():
+    """Wrap Connection.setstate, so objects loaded while stats are
+    collected are counted and timed. Until this is called, loads cost
+    nothing extra."""
+
+    global _setstate
+
+    if _setstate is not None:
+        return
+
+    _setstate = setstate = Connection.setstate
+
+    def timed_setstate(self, obj):
+        stats = current()
+
+        if stats is None:
+            return setstate(self, obj)
+
+        start = time.perf_counter()
+
+        try:
+            return setstate(self, obj)
+        finally:
+            stats.add_load(time.perf_counter() - start)
+
+    Connection.setstate = timed_setstate
+
+
+def notify_timed(registry, event, recorders):
+    """Call the subscribers for event, like registry.notify does, timing
+    each. Every recorder is called with the event, the name of the
+    subscriber and the seconds it took."""
+
+    adapters = getattr(registry, "adapters", None)
+
+    if adapters is None:
+        registry.notify(event)
+        return
+
+    for subscriber in adapters.subscriptions([providedBy(event)], None):
+        start = time.perf_counter()
+
+        try:
+            subscriber(event)
+        finally:
+            seconds = time.perf_counter() - start
+            name = subscriber_name(subscriber)
+
+            for record in recorders:
+                record(event, name, seconds)
+
+
+def subscriber_name(subscriber):
+    """Dotted name of a subscriber, pyramid copies the name of the
+    subscribers it wraps"""
+
+    return "%s.%s" % (
+        getattr(subscriber, "__module__", ""),
+        getattr(subscriber, "__qualname__", repr(subscriber)),
+    )
+
+
+def _rounded(seconds):
+    return dict((name, round(value, 6)) for name, value in seconds.items())
+
+
+def _header_times(seconds):
+    return ", ".join(
+        "%s=%.6f" % (name, value) for name, value in sorted(seconds.items())
+    )
@@ -1,3 +1,6 @@
+from ..formcache import form_cache
+from .exceptions import InvalidForm
+
 
 class Registry(object):
 
@@ -6,11 +9,46 @@ class Registry(object):
     content_types = {}
 
     @staticmethod
-    def register(name, clazz):
+    def register(name, clazz, compile_form=True):
+
+        """ Register clazz under name. Unless compile_form is false, the
+        edit form of the class is compiled right away """
 
         Registry.content_types[name] = clazz
 
+        if compile_form and getattr(clazz, "edit_form", None):
+            form_cache.get_template(clazz)
+
     @staticmethod
     def get(name):
 
         return Registry.content_types.get(name, None)
+
+    @staticmethod
+    def warmup(validate=False):
+
+        """ Compile the edit forms of all registered types that are not
+        compiled yet, and return the time parsing took in seconds per
+        type name, whether that was now or when the type was registered.
+        If validate is set, raise InvalidForm when forms bind to fields
+        that don't exist """
+
+        timings = {}
+        problems = []
+
+        for name, clazz in Registry.content_types.items():
+
+            if not getattr(clazz, "edit_form", None):
+                continue
+
+            template = form_cache.get_template(clazz)
+            timings[name] = template.seconds
+
+            if validate:
+                problems.extend(
+                    ["%s: %s" % (name, problem) for problem in template.check()])
+
+        if problems:
+            raise InvalidForm(problems)
+
+        return timings
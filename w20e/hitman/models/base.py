@@ -1,20 +1,35 @@
+import weakref
+from collections import deque
 from datetime import datetime
 
+from BTrees.Length import Length
 from BTrees.OOBTree import OOBTree  # type: ignore
 from persistent import Persistent
 from persistent.mapping import PersistentMapping
-from slugify import slugify
+from ZODB.POSException import ConflictError
 from w20e.forms.formdata import FormData
-from w20e.forms.utils import find_file
-from w20e.forms.xml.factory import XMLFormFactory
-from w20e.forms.xml.formfile import FormFile
-from zope.component import getSiteManager
 from zope.interface import Interface, implementer
 
-from w20e.hitman.utils import object_to_path
-
-from ..events import ContentAdded, ContentChanged, ContentRemoved
+from w20e.hitman.utils import (
+    invalidate_paths,
+    normalize_id,
+    object_to_path,
+    object_to_root,
+)
+
+from ..dispatch import batch_events, notify
+from ..events import (
+    ContentAdded,
+    ContentChanged,
+    ContentMoved,
+    ContentRemoved,
+    PathChanged,
+)
+from ..formcache import form_cache
+from .batch import ContentBatch
 from .exceptions import UniqueConstraint
+from .index import ContentTypeIndex
+from .order import ChildOrder
 
 
 class IContent(Interface):
@@ -53,8 +68,20 @@ class Base(object):
         return self._id
 
     def set_id(self, id):
+        """Set the id. Content in a folder gets another path, and so does
+        everything below it; use the rename_content of the folder to keep
+        its ids in order too."""
+
         self._id = id
 
+        try:
+            del self._v_path
+        except AttributeError:
+            pass
+
+        if getattr(self, "__parent__", None) is not None:
+            invalidate_paths(self)
+
     @property
     def owner(self):
         """get the creator userid"""
@@ -104,27 +131,78 @@ class Base(object):
     def set_attribute(self, name, value):
         """store an attribut in a low level manner"""
 
+        self.set_attributes({name: value})
+
+    def set_attributes(self, mapping):
+        """Store all attributes in mapping. The change time and persistent
+        state are touched once, and cached form data is updated in place.
+        Return the names of the stored fields, for ContentChanged."""
+
         data = getattr(self, self.data_attr_name)
-        data[name] = value
+
+        for name, value in mapping.items():
+            data[name] = value
+
         self._changed = datetime.now()
         self._p_changed = 1
-        # remove volatile cached data
+
         try:
-            del self._v_data
-        except:
-            pass  # no worries.we didn't have the cached value
+            cached = self._v_data
+        except AttributeError:
+            pass  # no worries, nothing to update
+        else:
+            for name, value in mapping.items():
+                cached[name] = value
+
+        return set(mapping)
+
+    def _refresh_data_(self, names):
+        """Update the cached form data for names, after they were stored
+        in the data container directly, as form submissions do"""
+
+        try:
+            cached = self._v_data
+        except AttributeError:
+            return
+
+        data = getattr(self, self.data_attr_name)
+
+        for name in names:
+            cached[name] = data.get(name, None)
 
     def _form_(self, request):
-        """Volatile form"""
+        """Form for this request. The form is created from the compiled
+        template of the class, so it only has its own data; within one
+        request the same form is returned. Only a weak reference to the
+        request is kept, so the request doesn't outlive itself on the
+        cached object."""
 
         try:
-            return self._v_form
+            form_request, form = self._v_form
+
+            if form_request() is request:
+                return form
         except:
-            form = find_file(self.edit_form, self.__class__)
-            xmlff = XMLFormFactory(FormFile(form).filename)
-            self._v_form = xmlff.create_form(action="")
+            pass
+
+        form = form_cache.get_form(self.__class__, self.edit_form)
+
+        try:
+            self._v_form = (weakref.ref(request), form)
+        except TypeError:
+            pass  # no weak references to this request, don't keep the form
+
+        return form
 
-            return self._v_form
+    @classmethod
+    def _add_form_(cls, request):
+        """Form for adding content of this class. Unless the class
+        overrides _form_, this needs no instance."""
+
+        if cls._form_ is not Base._form_:
+            return cls("TMP")._form_(request)
+
+        return form_cache.get_form(cls, cls.edit_form)
 
     @property
     def title(self):
@@ -140,14 +218,7 @@ class Base(object):
 
     @property
     def root(self):
-        _root = self
-
-        while getattr(_root, "__parent__", None) is not None:
-            if _root == _root.__parent__:
-                break
-            _root = _root.__parent__
-
-        return _root
+        return object_to_root(self)
 
     @classmethod
     def defaults(self):
@@ -184,20 +255,66 @@ class BaseContent(Persistent, Base):
         return self.id
 
 
-@implementer(IFolder)
-class BaseFolder(PersistentMapping, Base):
+class FolderMixin(Base):
 
-    """Base folder"""
+    """Folder behaviour. Classes using this should provide the mapping
+    API (get, keys, values, update, item access and len) for the
+    content, like BaseFolder and BTreeFolder do."""
 
-    def __init__(self, content_id, data=None, **kwargs):
-        if not data:
-            data = {}
-
-        PersistentMapping.__init__(self)
+    def __init__(self, content_id, data=None):
         Base.__init__(self, content_id, data=data)
-        self._order = []
+        self._order = ChildOrder()
+        self._type_index = ContentTypeIndex()
+
+    @property
+    def _order_(self):
+        """Ordering of the content id's. Folders stored before the
+        ordering was kept in a BTree still have a plain list, that is
+        migrated on first access."""
+
+        order = self._order
+
+        if not isinstance(order, ChildOrder):
+            order = self._order = ChildOrder(order)
+
+        return order
+
+    @property
+    def _types_(self):
+        """Index of content id's by type. Folders stored before the
+        index existed get it built on first access."""
+
+        index = getattr(self, "_type_index", None)
+
+        if index is None:
+            index = self._type_index = ContentTypeIndex()
+
+            for content in self.values():
+                index.index(
+                    content.id, content.content_type, IFolder.providedBy(content)
+                )
+
+        return index
+
+    @property
+    def _catalog_(self):
+        """Catalog of the site this folder is in, or None. The folder
+        methods keep it current, whether they emit events or not."""
+
+        return getattr(self.root, "_catalog", None)
 
     def add_content(self, content, emit_event=True):
+        self._insert_content(content)
+
+        catalog = self._catalog_
+
+        if catalog is not None:
+            catalog.index_subtree(content)
+
+        if emit_event:
+            notify(ContentAdded(content, self))
+
+    def _insert_content(self, content):
         # don't replace the content
         if content.id in self:
             raise UniqueConstraint(
@@ -205,14 +322,62 @@ class BaseFolder(PersistentMapping, Base):
                     this level"
             )
 
-        content.__parent__ = self
-        content.__name__ = content.id
+        self._locate_content(content)
         self[content.id] = content
-        self._order.append(content.id)
+        self._order_.append(content.id)
+        self._types_.index(
+            content.id, content.content_type, IFolder.providedBy(content)
+        )
+
+    def add_content_many(self, contents, emit_event=True):
+        """Add all contents in one go. All id's are checked before
+        anything is added, and the ordering and indexes are updated once.
+        Events are sent as a single ContentEventsBatched event."""
+
+        added = {}
+
+        for content in contents:
+            if content.id in added or content.id in self:
+                raise UniqueConstraint(
+                    "an item with this ID already exists at this level: %s" % content.id
+                )
+            added[content.id] = content
+
+        for content in added.values():
+            self._locate_content(content)
+
+        self.update(added)
+        self._order_.extend(added.keys())
+
+        for content in added.values():
+            self._types_.index(
+                content.id, content.content_type, IFolder.providedBy(content)
+            )
+
+        catalog = self._catalog_
+
+        if catalog is not None:
+            for content in added.values():
+                catalog.index_subtree(content)
 
         if emit_event:
-            sm = getSiteManager()
-            sm.notify(ContentAdded(content, self))
+            with batch_events(dispatch_events=False):
+                for content in added.values():
+                    notify(ContentAdded(content, self))
+
+        return list(added.values())
+
+    def _locate_content(self, content):
+        """Make self the parent of content"""
+
+        # content that was in a tree before may have cached paths
+        if IFolder.providedBy(content) and len(content):
+            invalidate_paths(content)
+        if getattr(content, "_v_path", None) is not None:
+            del content._v_path
+
+        content.__parent__ = self
+        content.__name__ = content.id
 
     def rename_content(self, id_from, id_to, emit_event=True):
         """Move object at id_from to id_to key"""
@@ -230,47 +395,146 @@ class BaseFolder(PersistentMapping, Base):
         if content is None:
             return False
 
+        old_path = content.dottedpath
+
         del self[id_from]
 
         content._id = normalized_id_to
         content.__name__ = normalized_id_to
 
         # retain order
-        if id_from in self._order:
-            self._order[self._order.index(id_from)] = normalized_id_to
+        if id_from in self._order_:
+            self._order_.rename(id_from, normalized_id_to)
+
+        self._types_.rename(id_from, normalized_id_to)
 
         self[content.id] = content
+        invalidate_paths(self)
+
+        catalog = self._catalog_
+
+        if catalog is not None:
+            catalog.move_path(old_path, content.dottedpath)
 
         if emit_event:
-            sm = getSiteManager()
-            sm.notify(ContentChanged(content))
+            # one event for the whole subtree, subscribers that index
+            # paths can rewrite them by prefix
+            notify(PathChanged(content, old_path, content.dottedpath))
+            notify(ContentChanged(content, fields=()))
 
-            # all children objects will now have to update the path
-            # (location) index. This could be speeded up by signalling
-            # that only the path changed and reindex could be more specific
-            if IFolder.providedBy(content):
-                for child in content.find_content():
-                    sm.notify(ContentChanged(child))
+    def move_content_to(self, content_id, target, emit_event=True):
+        """Move content to the target folder, keeping its id"""
+
+        if content_id in target:
+            raise UniqueConstraint(
+                "an item with this ID already exists at \
+                    this level"
+            )
+
+        content = self.get(content_id, None)
+
+        if content is None:
+            return False
+
+        _target = target
+
+        while _target is not None:
+            if _target is content:
+                raise ValueError("can't move content into itself")
+            _target = getattr(_target, "__parent__", None)
+
+        old_path = content.dottedpath
+        old_catalog = self._catalog_
+
+        del self[content_id]
+
+        if content_id in self._order_:
+            self._order_.remove(content_id)
+
+        self._types_.unindex(content_id)
+        invalidate_paths(self)
+
+        target._insert_content(content)
+        catalog = target._catalog_
+
+        if catalog is not None and catalog is old_catalog:
+            catalog.move_path(old_path, content.dottedpath)
+        else:
+            # moved to another site
+            if old_catalog is not None:
+                old_catalog.unindex_path(old_path)
+            if catalog is not None:
+                catalog.index_subtree(content)
+
+        if emit_event:
+            notify(ContentMoved(content, self, target, old_path, content.dottedpath))
+
+        return True
 
     def remove_content(self, content_id):
         try:
             content = self.get(content_id, None)
+            path = content.dottedpath
             del self[content_id]
-            self._order.remove(content_id)
 
-            sm = getSiteManager()
-            sm.notify(ContentRemoved(content, self))
+            if content_id in self._order_:
+                self._order_.remove(content_id)
+
+            self._types_.unindex(content_id)
+            self._unindex_path(path)
+
+            notify(ContentRemoved(content, self))
             # all children objects will now have to update the path
             # (location) index. This could be speeded up by signalling
             # that only the path changed and reindex could be more specific
             if IFolder.providedBy(content):
                 for child in content.find_content():
-                    sm.notify(ContentRemoved(child, child.__parent__))
+                    notify(ContentRemoved(child, child.__parent__))
 
             return content
         except:
             return None
 
+    def remove_content_many(self, content_ids, emit_event=True):
+        """Remove all content with the given id's, skipping id's that
+        are not there. Events are sent as a single ContentEventsBatched
+        event. Return the removed content."""
+
+        removed = []
+
+        for content_id in content_ids:
+            content = self.get(content_id, None)
+
+            if content is None:
+                continue
+
+            path = content.dottedpath
+            del self[content_id]
+
+            if content_id in self._order_:
+                self._order_.remove(content_id)
+
+            self._types_.unindex(content_id)
+            self._unindex_path(path)
+            removed.append(content)
+
+        if emit_event:
+            with batch_events(dispatch_events=False):
+                for content in removed:
+                    notify(ContentRemoved(content, self))
+
+                    if IFolder.providedBy(content):
+                        for child in content.find_content():
+                            notify(ContentRemoved(child, child.__parent__))
+
+        return removed
+
+    def _unindex_path(self, path):
+        catalog = self._catalog_
+
+        if catalog is not None:
+            catalog.unindex_path(path)
+
     def get_content(self, content_id, content_type=None):
         obj = self.get(content_id, None)
 
@@ -289,110 +553,376 @@ class BaseFolder(PersistentMapping, Base):
         NOTE: also returns temporary object IDs
         """
 
-        all_ids = list(self.keys())
-
-        def custom_sort_key(item):
-            max_order = len(self._order) + 1
-            return (self._order.index(item) if item in self._order else max_order, item)
+        all_ids = [id for id in self._order_ if id in self]
 
-        all_ids.sort(key=custom_sort_key)
+        # unordered id's go last, sorted by id
+        if len(all_ids) < len(self):
+            ordered = set(all_ids)
+            all_ids.extend(sorted(id for id in self.keys() if id not in ordered))
 
         return all_ids
 
-    def list_content(self, content_type=None, iface=None, **kwargs):
-        """List content of this folder. If content_type is given,
-        list only these things.
-        """
+    def _filter_content_ids(self, ids, content_type=None, iface=None):
+        """Filter ids on content type and/or interface. The type index
+        is used where possible, only content that was not added through
+        add_content is loaded to check its type."""
 
-        all_content = []
+        index = self._types_
 
         if content_type:
             if isinstance(content_type, str):
                 content_type = [content_type]
 
-            all_content = [
-                obj
-                for obj in list(self.values())
-                if getattr(obj, "content_type", None) in content_type
+            ids = [
+                id
+                for id in ids
+                if (
+                    index.content_type(id)
+                    if id in index
+                    else getattr(self[id], "content_type", None)
+                )
+                in content_type
             ]
-        if iface:
-            all_content = [obj for obj in list(self.values()) if iface.providedBy(obj)]
+        if iface is IFolder:
+            folder_ids = index.folder_ids()
+            ids = [
+                id
+                for id in ids
+                if (id in folder_ids if id in index else IFolder.providedBy(self[id]))
+            ]
+        elif iface:
+            ids = [id for id in ids if iface.providedBy(self[id])]
+
+        return ids
+
+    def batch_content(
+        self,
+        start=0,
+        limit=None,
+        content_type=None,
+        iface=None,
+        order_by=None,
+        order_by_reversed=False,
+    ):
+        """Lazy version of list_content. Return a ContentBatch holding
+        the id's from start up to start + limit. Only the objects in
+        the batch are fetched when iterating. Ordering by anything but
+        the folder order or the id needs to load all content.
+        """
 
-        if not (content_type or iface):
-            all_content = list(self.values())
+        ids = self._filter_content_ids(
+            self._list_content_ids(), content_type=content_type, iface=iface
+        )
 
-        if kwargs.get("order_by", None):
-            reverse = kwargs.get("order_by_reversed", 0)
-            all_content.sort(
-                key=lambda x: getattr(x, kwargs["order_by"]), reverse=reverse
+        if order_by == "id":
+            ids.sort(reverse=order_by_reversed)
+        elif order_by:
+            ids.sort(
+                key=lambda id: getattr(self[id], order_by), reverse=order_by_reversed
             )
-        else:
-            all_content.sort(key=lambda x: x.id)
 
-        return all_content
+        return ContentBatch(self, ids, start=start, limit=limit)
+
+    def list_content(self, content_type=None, iface=None, **kwargs):
+        """List content of this folder. If content_type is given,
+        list only these things. Unless order_by is given, content is
+        listed in the folder order.
+        """
+
+        return list(
+            self.batch_content(
+                content_type=content_type,
+                iface=iface,
+                order_by=kwargs.get("order_by", None),
+                order_by_reversed=kwargs.get("order_by_reversed", 0),
+            )
+        )
 
     def find_content(self, content_type=None):
-        """Find content recursively from the given folder. Use it
-        wisely..."""
+        """Find content recursively from the given folder, in the order
+        of iter_content: the content of a folder in the folder order,
+        followed by the content found in each of its subfolders. If a
+        catalog is installed on the root, and this folder is in it, the
+        catalog is queried instead, and the result put in that order."""
+
+        catalog = self._catalog_
 
-        found = self.list_content(content_type=content_type)
+        if catalog is not None and (self.root is self or catalog.is_indexed(self)):
+            found = catalog.query(
+                path=self.dottedpath, content_type=content_type, include_path=False
+            )
+            found.sort(key=lambda content: _find_key(content, self))
+
+            return found
+
+        return list(self.iter_content(content_type=content_type, deactivate=False))
+
+    def iter_content(
+        self,
+        content_type=None,
+        iface=None,
+        max_depth=None,
+        breadth_first=False,
+        deactivate=True,
+    ):
+        """Walk the content below this folder and yield what matches,
+        lazily, so callers can stop early. A max_depth of 1 only yields
+        this folder's own content. If deactivate is set, content that
+        was not changed is turned into a ghost again once the walk has
+        passed it, so memory stays bounded on large trees.
+        """
 
-        # recurse through folderish types.
-        folders = self.list_content(iface=IFolder)
+        pending = deque([(self, 1)])
 
-        for sub in folders:
-            try:
-                found += sub.find_content(content_type=content_type)
-            except:
-                # looks like it's not a folder...
-                pass
+        while pending:
+            if breadth_first:
+                folder, depth = pending.popleft()
+            else:
+                folder, depth = pending.pop()
 
-        return found
+            ids = folder._list_content_ids()
+            folder_ids = set()
+
+            if max_depth is None or depth < max_depth:
+                folder_ids.update(folder._filter_content_ids(ids, iface=IFolder))
+
+            for content_id in folder._filter_content_ids(
+                ids, content_type=content_type, iface=iface
+            ):
+                content = folder.get(content_id, None)
+
+                if content is None:
+                    continue
+
+                yield content
+
+                if deactivate and content_id not in folder_ids:
+                    content._p_deactivate()
+
+            subfolders = [(folder[id], depth + 1) for id in ids if id in folder_ids]
+
+            if not breadth_first:
+                subfolders.reverse()
+
+            pending.extend(subfolders)
+
+            if deactivate and folder is not self:
+                folder._p_deactivate()
 
     def _normalize_id(self, id):
         """change all non-letters and non-numbers to dash"""
         # id = id.lower()
         # id = re.sub('[^-a-z0-9_]+', '-', id)
         # return id
-        return slugify(id)
+        return normalize_id(id)
 
     def generate_content_id(self, base_id):
+        """Return the normalized base_id, or if that is taken, base_id_n
+        for the first free n after the last one handed out. The counter
+        per base id makes that a single lookup in most cases. Counters
+        are Length objects, so concurrent adds don't conflict on them;
+        two adds getting the same id conflict on the folder itself."""
+
         base_id = self._normalize_id(base_id)
 
         if base_id not in self:
             return base_id
 
-        cnt = 1
+        counters = getattr(self, "_id_counters", None)
+
+        if counters is None:
+            counters = self._id_counters = OOBTree()
+
+        counter = counters.get(base_id, None)
+
+        if counter is None:
+            counter = counters[base_id] = Length()
+
+        cnt = counter() + 1
 
         while "%s_%s" % (base_id, cnt) in self:
             cnt += 1
 
+        counter.change(cnt - counter())
+
         return "%s_%s" % (base_id, cnt)
 
     def move_content(self, content_id, delta):
         """Move the content in the order by delta, where delta may be
         negative"""
 
-        curr_idx = self._order.index(content_id)
+        self._order_.move(content_id, delta)
 
         try:
-            self._order.remove(content_id)
-            self._order.insert(curr_idx + delta, content_id)
-            sm = getSiteManager()
-            sm.notify(ContentChanged(self.get_content(content_id)))
+            notify(ContentChanged(self.get_content(content_id), fields=()))
         except:
             pass
 
     def set_order(self, order=[]):
-        self._order = order
+        self._order_.clear()
+        self._order_.extend(order)
+
+        # emit changed event for all children, as one batch
+        with batch_events(dispatch_events=False):
+            for child in self.list_content():
+                notify(ContentChanged(child, fields=()))
+
+
+@implementer(IFolder)
+class BaseFolder(PersistentMapping, FolderMixin):
+
+    """Base folder"""
+
+    def __init__(self, content_id, data=None, **kwargs):
+        if not data:
+            data = {}
+
+        PersistentMapping.__init__(self)
+        FolderMixin.__init__(self, content_id, data=data)
+
+    def __repr__(self):
+        """return the ID as base representation"""
+
+        return self.id
+
+    def _p_resolveConflict(self, old, committed, new):
+        """Merge concurrent changes to the folder, like adding or removing
+        different content. The order and type index are BTrees that
+        resolve their own conflicts. Changes to the same key or attribute
+        still conflict."""
 
-        # emit changed event for all children
-        sm = getSiteManager()
-        children = self.list_content()
-        for child in children:
-            sm.notify(ContentChanged(child))
+        return _merge_state(old, committed, new, mappings=("data", "_container"))
+
+
+@implementer(IFolder)
+class BTreeFolder(Persistent, FolderMixin):
+
+    """Folder that keeps its content in an OOBTree, with a separate
+    counter. Unlike BaseFolder, adding or removing content only writes
+    the BTree buckets involved, not the whole mapping, so large folders
+    stay cheap to change and concurrent adds rarely conflict."""
+
+    def __init__(self, content_id, data=None, **kwargs):
+        if not data:
+            data = {}
+
+        Persistent.__init__(self)
+        self._tree = OOBTree()
+        self._count = Length()
+        FolderMixin.__init__(self, content_id, data=data)
 
     def __repr__(self):
         """return the ID as base representation"""
 
         return self.id
+
+    def __getitem__(self, key):
+        return self._tree[key]
+
+    def __setitem__(self, key, value):
+        if self._tree.insert(key, value):
+            self._count.change(1)
+        else:
+            self._tree[key] = value
+
+    def __delitem__(self, key):
+        del self._tree[key]
+        self._count.change(-1)
+
+    def __contains__(self, key):
+        return key in self._tree
+
+    def __len__(self):
+        return self._count()
+
+    def __iter__(self):
+        return iter(self._tree.keys())
+
+    def get(self, key, default=None):
+        return self._tree.get(key, default)
+
+    def keys(self):
+        return self._tree.keys()
+
+    def values(self):
+        return self._tree.values()
+
+    def items(self):
+        return self._tree.items()
+
+    def update(self, mapping):
+        for key, value in mapping.items():
+            self[key] = value
+
+
+_missing = object()
+
+
+def _find_key(content, folder):
+    """Sort key that puts content found below folder in the order of
+    iter_content. Per level, content of that folder itself comes before
+    content further down, and both follow the folder order, with
+    unordered content last, by id."""
+
+    key = []
+    below = 0
+
+    while content is not folder:
+        parent = content.__parent__
+        pos = parent._order_.position(content.id)
+
+        if pos is None:
+            key.append((below, 1, content.id))
+        else:
+            key.append((below, 0, pos))
+
+        below = 1
+        content = parent
+
+    key.reverse()
+
+    return key
+
+
+def _same(value, other):
+    """Compare state values. Persistent references to different objects
+    can't be compared, and are not the same."""
+
+    if value is _missing or other is _missing:
+        return value is other
+
+    try:
+        return value == other
+    except ValueError:
+        return False
+
+
+def _merge_state(old, committed, new, mappings=()):
+    """Three way merge of object states. The names in mappings are dicts
+    that are merged by key, other attributes as a whole. Raise
+    ConflictError if both sides changed the same key differently."""
+
+    merged = {}
+
+    for key in set(old) | set(committed) | set(new):
+        old_value = old.get(key, _missing)
+        committed_value = committed.get(key, _missing)
+        new_value = new.get(key, _missing)
+
+        if key in mappings and isinstance(new_value, dict):
+            value = _merge_state(
+                old_value if isinstance(old_value, dict) else {},
+                committed_value if isinstance(committed_value, dict) else {},
+                new_value,
+            )
+        elif _same(new_value, old_value):
+            value = committed_value
+        elif _same(committed_value, old_value) or _same(committed_value, new_value):
+            value = new_value
+        else:
+            raise ConflictError("conflicting changes to %s" % key)
+
+        if value is not _missing:
+            merged[key] = value
+
+    return merged
@@ -0,0 +1,52 @@
+class ContentBatch(object):
+
+    """Sliceable, length aware listing of folder content. The batch
+    only holds id's; objects are fetched from the folder when they are
+    accessed, so only the requested page gets loaded."""
+
+    def __init__(self, folder, ids, start=0, limit=None):
+        self.folder = folder
+        self.ids = ids
+        self.start = start
+        self.limit = limit
+
+    @property
+    def total(self):
+        """Number of items in all pages"""
+
+        return len(self.ids)
+
+    @property
+    def page_ids(self):
+        if self.limit is None:
+            return self.ids[self.start :]
+
+        return self.ids[self.start : self.start + self.limit]
+
+    @property
+    def has_previous(self):
+        return self.start > 0
+
+    @property
+    def has_next(self):
+        return self.limit is not None and self.start + self.limit < self.total
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    def __iter__(self):
+        for content_id in self.page_ids:
+            yield self.folder[content_id]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return ContentBatch(self.folder, self.page_ids[idx])
+
+        return self.folder[self.page_ids[idx]]
+
+    def __repr__(self):
+        return "<ContentBatch %s-%s of %s>" % (
+            self.start,
+            self.start + len(self),
+            self.total,
+        )
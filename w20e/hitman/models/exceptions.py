@@ -3,3 +3,7 @@
 
 class UniqueConstraint(Exception):
     pass
+
+
+class InvalidForm(Exception):
+    pass
@@ -0,0 +1,71 @@
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from persistent import Persistent
+
+
+class ContentTypeIndex(Persistent):
+
+    """Per folder index of child id's by content type. It also keeps
+    track of the folderish children, so that listing or recursing
+    through subfolders doesn't need to load the other content."""
+
+    def __init__(self):
+        Persistent.__init__(self)
+        self._types = OOBTree()
+        self._by_id = OOBTree()
+        self._folders = OOTreeSet()
+
+    def __contains__(self, id):
+        return id in self._by_id
+
+    def index(self, id, content_type, folderish=False):
+        self.unindex(id)
+
+        ids = self._types.get(content_type, None)
+
+        if ids is None:
+            ids = self._types[content_type] = OOTreeSet()
+
+        ids.insert(id)
+        self._by_id[id] = content_type
+
+        if folderish:
+            self._folders.insert(id)
+
+    def unindex(self, id):
+        content_type = self._by_id.pop(id, None)
+
+        if content_type is None:
+            return
+
+        ids = self._types.get(content_type, None)
+
+        if ids is not None:
+            ids.remove(id)
+
+            if not ids:
+                del self._types[content_type]
+
+        if id in self._folders:
+            self._folders.remove(id)
+
+    def rename(self, id_from, id_to):
+        content_type = self._by_id.get(id_from, None)
+
+        if content_type is None:
+            return
+
+        folderish = id_from in self._folders
+        self.unindex(id_from)
+        self.index(id_to, content_type, folderish=folderish)
+
+    def content_type(self, id):
+        return self._by_id.get(id, None)
+
+    def ids(self, content_type):
+        return self._types.get(content_type, ())
+
+    def content_types(self):
+        return self._types.keys()
+
+    def folder_ids(self):
+        return self._folders
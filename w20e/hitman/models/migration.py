@@ -0,0 +1,66 @@
+from w20e.hitman.utils import invalidate_paths
+
+from .base import BaseFolder, BTreeFolder, IFolder
+
+
+def migrate_folder(folder, clazz=None):
+    """Migrate a PersistentMapping based folder to a BTreeFolder. The
+    new folder gets all attributes and content of the old one, and
+    replaces it in its parent. Subclasses of BaseFolder need a matching
+    BTreeFolder subclass passed as clazz. Return the new folder; if the
+    folder has no parent, storing it is up to the caller."""
+
+    if clazz is None:
+        if folder.__class__ is not BaseFolder:
+            raise ValueError("no BTreeFolder class given for %s" % folder.__class__)
+
+        clazz = BTreeFolder
+
+    folder._p_activate()
+
+    new = clazz(folder.id)
+
+    for name, value in folder.__dict__.items():
+        if name != "data" and not name.startswith("_v_"):
+            setattr(new, name, value)
+
+    for content_id, content in list(folder.items()):
+        content.__parent__ = new
+        new[content_id] = content
+
+    parent = getattr(folder, "__parent__", None)
+
+    if parent is not None:
+        parent[folder.id] = new
+        parent._types_.index(folder.id, new.content_type, True)
+
+    catalog = getattr(new.root, "_catalog", None)
+
+    if catalog is not None and catalog.is_indexed(folder):
+        catalog.index(new)
+
+    invalidate_paths(new)
+
+    return new
+
+
+def migrate_folders(root, classes=None):
+    """Migrate all folders below root that are BaseFolder, or a class
+    that is a key in classes, to BTreeFolder or the class it maps to.
+    Return the number of migrated folders."""
+
+    classes = dict(classes or {})
+    classes.setdefault(BaseFolder, BTreeFolder)
+
+    folders = [
+        folder
+        for folder in root.iter_content(
+            iface=IFolder, breadth_first=True, deactivate=False
+        )
+        if folder.__class__ in classes
+    ]
+
+    for folder in folders:
+        migrate_folder(folder, classes[folder.__class__])
+
+    return len(folders)
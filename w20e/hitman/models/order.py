@@ -0,0 +1,168 @@
+import random
+
+from BTrees.Length import Length
+from BTrees.LOBTree import LOBTree
+from BTrees.OLBTree import OLBTree
+from persistent import Persistent
+
+
+class ChildOrder(Persistent):
+
+    """Persistent ordering of child id's. Every id gets a numeric
+    position, leaving gaps between neighbours so that inserts and moves
+    only touch the moved id. Both directions are stored in BTrees, so
+    lookup, insert, move, rename and remove are O(log n), and iteration
+    follows the order without sorting."""
+
+    GAP = 1 << 16
+
+    def __init__(self, ids=()):
+        Persistent.__init__(self)
+        self._positions = OLBTree()
+        self._ids = LOBTree()
+        self._length = Length()
+        self.extend(ids)
+
+    def __len__(self):
+        return self._length()
+
+    def __bool__(self):
+        return True
+
+    def __contains__(self, id):
+        return id in self._positions
+
+    def __iter__(self):
+        return iter(self._ids.values())
+
+    def index(self, id):
+        """Return the index of id in the order. This one is O(n), so
+        use it sparingly"""
+
+        pos = self._positions[id]
+        return len(self._ids.keys(max=pos)) - 1
+
+    def position(self, id):
+        """Return the position of id, or None if it is not ordered.
+        Positions sort like the order, but are not contiguous."""
+
+        return self._positions.get(id, None)
+
+    def append(self, id):
+        """Append id at the end of the order. Appending an id that is
+        already ordered leaves it where it is"""
+
+        if id in self._positions:
+            return
+
+        # a random offset keeps concurrent appends from taking the same
+        # position, so their BTree changes can be merged
+        if self._ids:
+            pos = self._ids.maxKey() + self.GAP + random.randrange(self.GAP)
+        else:
+            pos = random.randrange(self.GAP)
+
+        self._set(id, pos)
+        self._length.change(1)
+
+    def extend(self, ids):
+        for id in ids:
+            self.append(id)
+
+    def remove(self, id):
+        try:
+            pos = self._positions.pop(id)
+        except KeyError:
+            raise ValueError("%s is not in the order" % id)
+
+        del self._ids[pos]
+        self._length.change(-1)
+
+    def rename(self, id_from, id_to):
+        """Give id_to the position of id_from"""
+
+        pos = self._positions.pop(id_from)
+        self._set(id_to, pos)
+
+    def move(self, id, delta):
+        """Move id by delta places, where delta may be negative. Moving
+        beyond either end puts the id at that end"""
+
+        pos = self._positions[id]
+        target = pos
+
+        if delta < 0:
+            for _i in range(-delta):
+                try:
+                    target = self._ids.maxKey(target - 1)
+                except ValueError:
+                    break
+
+            if target == pos:
+                return
+
+            new_pos = self._between(self._before(target), target)
+        else:
+            for _i in range(delta):
+                try:
+                    target = self._ids.minKey(target + 1)
+                except ValueError:
+                    break
+
+            if target == pos:
+                return
+
+            new_pos = self._between(target, self._after(target))
+
+        # the positions may have been renumbered to make room
+        del self._ids[self._positions[id]]
+        self._set(id, new_pos)
+
+    def clear(self):
+        self._positions.clear()
+        self._ids.clear()
+        self._length.set(0)
+
+    def _set(self, id, pos):
+        self._positions[id] = pos
+        self._ids[pos] = id
+
+    def _before(self, pos):
+        try:
+            return self._ids.maxKey(pos - 1)
+        except ValueError:
+            return None
+
+    def _after(self, pos):
+        try:
+            return self._ids.minKey(pos + 1)
+        except ValueError:
+            return None
+
+    def _between(self, low, high):
+        """Find a free position between low and high, either of which
+        may be None for the start or end of the order. Renumber if
+        there is no room left."""
+
+        if low is None:
+            return high - self.GAP
+
+        if high is None:
+            return low + self.GAP
+
+        if high - low > 1:
+            return (low + high) // 2
+
+        low_id, high_id = self._ids[low], self._ids[high]
+        self._renumber()
+
+        return self._between(self._positions[low_id], self._positions[high_id])
+
+    def _renumber(self):
+        ids = list(self._ids.values())
+
+        self._positions.clear()
+        self._ids.clear()
+
+        for idx, id in enumerate(ids):
+            self._set(id, idx * self.GAP)
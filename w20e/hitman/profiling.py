@@ -0,0 +1,177 @@
+""" Opt in profiling of content event subscribers """
+
+import logging
+import signal
+import sys
+import threading
+from collections import deque
+
+from pyramid.settings import asbool
+from zope.interface import providedBy
+
+from .instrumentation import notify_timed
+
+
+log = logging.getLogger(__name__)
+
+# durations kept per subscriber and event interface, for the p95
+SAMPLES = 1000
+
+_profile = None
+
+
+class SubscriberStats(object):
+
+    """Calls and durations of one subscriber for one event interface"""
+
+    __slots__ = ("calls", "total", "max", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def p95(self):
+        samples = sorted(self.samples)
+
+        return samples[int(0.95 * (len(samples) - 1))] if samples else 0.0
+
+
+class Profile(object):
+
+    """Dispatches events to their subscribers one by one, timing each.
+    Subscribers that take longer than threshold seconds are logged."""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def dispatch(self, registry, event):
+        """Call the subscribers for event, like registry.notify does"""
+
+        notify_timed(registry, event, [self.record])
+
+    def record(self, event, subscriber, seconds):
+        """Add a call of subscriber for event, as notify_timed does"""
+
+        iface = next(iter(providedBy(event)), event.__class__).__name__
+        self.add(subscriber, iface, seconds)
+
+    def add(self, subscriber, iface, seconds):
+        with self._lock:
+            stats = self._stats.get((subscriber, iface), None)
+
+            if stats is None:
+                stats = self._stats[(subscriber, iface)] = SubscriberStats()
+
+            stats.add(seconds)
+
+        if self.threshold is not None and seconds > self.threshold:
+            log.warning(
+                "slow subscriber %s for %s: %.1f ms", subscriber, iface, seconds * 1000
+            )
+
+    def report(self):
+        """Return the stats per subscriber and event interface as dicts,
+        the most time consuming first"""
+
+        with self._lock:
+            items = [(key, stats, stats.p95()) for key, stats in self._stats.items()]
+
+        report = [
+            {
+                "subscriber": subscriber,
+                "interface": iface,
+                "calls": stats.calls,
+                "total": stats.total,
+                "p95": p95,
+                "max": stats.max,
+            }
+            for (subscriber, iface), stats, p95 in items
+        ]
+
+        return sorted(report, key=lambda row: row["total"], reverse=True)
+
+    def dump(self, stream=None):
+        """Write the report as a table to stream, stdout by default"""
+
+        stream = stream or sys.stdout
+        stream.write(
+            "%-50s %-30s %8s %10s %10s %10s\n"
+            % ("subscriber", "interface", "calls", "total ms", "p95 ms", "max ms")
+        )
+
+        for row in self.report():
+            stream.write(
+                "%-50s %-30s %8d %10.1f %10.1f %10.1f\n"
+                % (
+                    row["subscriber"],
+                    row["interface"],
+                    row["calls"],
+                    row["total"] * 1000,
+                    row["p95"] * 1000,
+                    row["max"] * 1000,
+                )
+            )
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def get_profile():
+    """Return the active Profile, or None if profiling is off"""
+
+    return _profile
+
+
+def enable_profiling(threshold=None):
+    """Profile all content event subscribers from now on. Return the
+    Profile."""
+
+    global _profile
+
+    _profile = Profile(threshold=threshold)
+
+    return _profile
+
+
+def disable_profiling():
+    global _profile
+
+    _profile = None
+
+
+def includeme(config):
+    """Turn on profiling if hitman.profiling is set, through
+    config.include('w20e.hitman.profiling'). Subscribers slower than
+    hitman.profiling.threshold milliseconds are logged. If
+    hitman.profiling.signal names a signal, e.g. SIGUSR2, the report is
+    written to stderr when the process receives it."""
+
+    settings = config.get_settings()
+
+    if not asbool(settings.get("hitman.profiling", False)):
+        return
+
+    threshold = settings.get("hitman.profiling.threshold", None)
+
+    if threshold is not None:
+        threshold = float(threshold) / 1000
+
+    profile = enable_profiling(threshold=threshold)
+    signame = settings.get("hitman.profiling.signal", None)
+
+    if signame:
+        signal.signal(
+            getattr(signal, signame), lambda signum, frame: profile.dump(sys.stderr)
+        )
+
@@ -0,0 +1,136 @@
+import threading
+
+import transaction
+from pyramid import testing
+from ZODB import DB
+from ZODB.MappingStorage import MappingStorage
+from w20e.hitman.background import async_subscriber, start_worker, stop_worker
+from w20e.hitman.dispatch import notify
+from w20e.hitman.events import (
+    ContentChanged,
+    IContentEventsBatchedEvent,
+    IObjectAddedEvent,
+    IObjectChangedEvent,
+)
+from w20e.hitman.models.base import BaseContent, BaseFolder
+
+
+class TestBackground(object):
+
+    def setup_method(self, method):
+        self.config = testing.setUp()
+        self.config.include("w20e.hitman.background")
+        self.db = DB(MappingStorage())
+        self.calls = []
+
+        conn = self.db.open()
+        conn.root()["root"] = BaseFolder("root")
+        transaction.commit()
+        conn.close()
+
+    def teardown_method(self, method):
+        stop_worker()
+        transaction.abort()
+        self.db.close()
+        testing.tearDown()
+
+    def subscriber(self, event):
+        self.calls.append(
+            (event.object.id, event.object._p_jar, threading.current_thread()))
+        event.object.set_attribute("seen", True)
+
+    def add(self, content_id, commit=True):
+        conn = self.db.open()
+        conn.root()["root"].add_content(BaseContent(content_id))
+
+        if commit:
+            transaction.commit()
+        else:
+            transaction.abort()
+
+        conn.close()
+
+    def test_after_commit(self):
+
+        start_worker(db=self.db)
+        self.config.add_async_subscriber(self.subscriber, IObjectAddedEvent)
+
+        self.add("x0", commit=False)
+        self.add("x1")
+        assert self.calls == [] or self.calls[0][0] == "x1"
+
+        stop_worker()
+
+        assert [call[0] for call in self.calls] == ["x1"]
+        assert self.calls[0][2] is not threading.current_thread()
+
+        conn = self.db.open()
+        assert conn.root()["root"]["x1"]._data_["seen"] is True
+        conn.close()
+
+    def test_retries(self):
+
+        start_worker(db=self.db, delay=0)
+        failures = []
+
+        def failing(event):
+            if len(failures) < 2:
+                failures.append(event)
+                raise ValueError()
+            self.calls.append(event)
+
+        self.config.add_subscriber(
+            async_subscriber(failing, retries=2), IObjectAddedEvent)
+        self.add("x0")
+        stop_worker()
+
+        assert len(failures) == 2
+        assert len(self.calls) == 1
+
+    def test_without_worker(self):
+
+        try:
+            start_worker(None)
+            assert False
+        except ValueError:
+            pass
+
+        events = []
+        self.config.add_async_subscriber(events.append, IObjectChangedEvent)
+
+        # events without persistent objects run after the commit
+        notify(ContentChanged(None))
+        assert events == []
+        transaction.commit()
+        assert len(events) == 1
+
+        # events with persistent objects need the worker, without one
+        # they are dropped, and the content is still written
+        self.config.add_async_subscriber(self.subscriber, IObjectAddedEvent)
+        self.add("x0")
+
+        assert self.calls == []
+
+        conn = self.db.open()
+        assert "x0" in conn.root()["root"]
+        conn.close()
+
+    def test_batched(self):
+
+        start_worker(db=self.db)
+        jars = []
+
+        def batched(event):
+            jars.append(event.events[0].object._p_jar)
+
+        self.config.add_async_subscriber(batched, IContentEventsBatchedEvent)
+
+        conn = self.db.open()
+        conn.root()["root"].add_content_many([BaseContent("x0"), BaseContent("x1")])
+        transaction.commit()
+        stop_worker()
+
+        assert len(jars) == 1
+        assert jars[0] is not None
+        assert jars[0] is not conn
+        conn.close()
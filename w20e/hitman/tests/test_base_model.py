@@ -1,17 +1,17 @@
 from pyramid import testing
-from w20e.hitman.models.base import BaseFolder, BaseContent
+from w20e.hitman.models.base import BaseFolder, BaseContent, IFolder
 import datetime
-from zope.interface import Interface, implements
+from zope.interface import Interface, implementer
 
 class ITestContent(Interface):
     """ marker interface for TestContent """
     pass
 
 
+@implementer(ITestContent)
 class TestContent(BaseContent):
     """ implementation of the BaseContent class just for testing """
 
-    @implementer(ITestContent)
     edit_form = 'test_content_form.xml'
 
 
@@ -59,6 +59,14 @@ class TestBaseModel(object):
         self.x0.set_attribute('whatyouwant', 'a little respect')
         assert self.x0._data_.as_dict() == {
                 'whatyouwant': 'a little respect'}
+
+        # cached form data is updated in place
+        data = self.x0._data_
+        changed = self.x0.changed
+        assert self.x0.set_attributes({'a': 1, 'b': 2}) == set(['a', 'b'])
+        assert self.x0._data_ is data
+        assert data['b'] == 2
+        assert self.x0.changed > changed
         form = self.x0._form_(request)
         assert self.x0.title == 'x0'
         now = datetime.datetime.now()
@@ -98,5 +106,57 @@ class TestBaseModel(object):
         assert self.f0.generate_content_id("wat's up?") == "wat-s-up-"
         assert self.f0.generate_content_id("yello") == "yello_1"
 
+        # the counter continues after the last id handed out
+        for i in range(1, 4):
+            self.f0.add_content(TestContent("yello_%s" % i))
+
+        assert self.f0.generate_content_id("yello") == "yello_4"
+        self.f0.add_content(TestContent("yello_4"))
+        assert self.f0._id_counters["yello"]() == 4
+        assert self.f0.generate_content_id("yello") == "yello_5"
+
+        for i in range(1, 5):
+            self.f0.remove_content("yello_%s" % i)
+
         self.f0.remove_content("yello")
 
+
+class TestIterContent(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+        self.root = BaseFolder("root")
+
+        for i in range(3):
+            folder = BaseFolder("f%s" % i)
+            self.root.add_content(folder)
+
+            for j in range(3):
+                folder.add_content(TestContent("x%s%s" % (i, j)))
+
+            folder.add_content(BaseFolder("sub%s" % i))
+            folder.get_content("sub%s" % i).add_content(TestContent("y%s" % i))
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_iter_content(self):
+
+        found = [obj.id for obj in self.root.iter_content(content_type="testcontent")]
+        assert found == [
+            "x00", "x01", "x02", "y0",
+            "x10", "x11", "x12", "y1",
+            "x20", "x21", "x22", "y2"]
+        assert found == [
+            obj.id for obj in self.root.find_content(content_type="testcontent")]
+
+        found = [obj.id for obj in self.root.iter_content(max_depth=1)]
+        assert found == ["f0", "f1", "f2"]
+
+        found = [obj.id for obj in self.root.iter_content(
+            iface=IFolder, breadth_first=True)]
+        assert found == ["f0", "f1", "f2", "sub0", "sub1", "sub2"]
+
+        iterator = self.root.iter_content(content_type="testcontent")
+        assert next(iterator).id == "x00"
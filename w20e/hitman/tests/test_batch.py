@@ -0,0 +1,46 @@
+from pyramid import testing
+from w20e.hitman.models.base import BaseFolder, BaseContent, IFolder
+
+
+class TestContentBatch(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+        self.folder = BaseFolder("f")
+
+        for i in range(10):
+            self.folder.add_content(BaseContent("x%s" % i))
+
+        self.folder.add_content(BaseFolder("sub"))
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_batch(self):
+
+        batch = self.folder.batch_content(start=2, limit=3)
+
+        assert batch.total == 11
+        assert len(batch) == 3
+        assert [obj.id for obj in batch] == ["x2", "x3", "x4"]
+        assert batch[0].id == "x2"
+        assert [obj.id for obj in batch[1:]] == ["x3", "x4"]
+        assert batch.has_previous
+        assert batch.has_next
+
+        batch = self.folder.batch_content(start=8, limit=5)
+        assert [obj.id for obj in batch] == ["x8", "x9", "sub"]
+        assert not batch.has_next
+
+    def test_batch_filter_and_order(self):
+
+        batch = self.folder.batch_content(content_type="basecontent", limit=2)
+        assert batch.total == 10
+
+        batch = self.folder.batch_content(iface=IFolder)
+        assert [obj.id for obj in batch] == ["sub"]
+
+        batch = self.folder.batch_content(order_by="id", order_by_reversed=True)
+        assert batch[0].id == "x9"
+        assert batch[-1].id == "sub"
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from pyramid import testing
+from w20e.hitman.catalog import get_catalog, install_catalog
+from w20e.hitman.events import IObjectPathChangedEvent, IObjectRemovedEvent
+from w20e.hitman.models.base import BaseFolder, BaseContent
+
+
+class TestCatalog(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+        self.config.include("w20e.hitman.catalog")
+
+        self.root = BaseFolder("root")
+        self.root.add_content(BaseFolder("f0"))
+
+        self.catalog = install_catalog(self.root)
+
+        self.f0 = self.root.get_content("f0")
+        self.f1 = BaseFolder("f1")
+        self.f0.add_content(self.f1)
+
+        for i in range(3):
+            self.f0.add_content(BaseContent("x%s" % i))
+            self.f1.add_content(BaseContent("y%s" % i))
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_index(self):
+
+        assert get_catalog(self.f1) is self.catalog
+        assert len(self.catalog) == 8
+        assert self.catalog.get_object(".f0.f1.y1").id == "y1"
+
+        found = self.catalog.query(path=".f0.f1")
+        assert [obj.id for obj in found] == ["f1", "y0", "y1", "y2"]
+
+        found = self.catalog.query(path=".f0", content_type="basefolder")
+        assert [obj.id for obj in found] == ["f0", "f1"]
+
+        found = self.f0.find_content(content_type="basecontent")
+        assert len(found) == 6
+
+        yesterday = datetime.now() - timedelta(days=1)
+        assert len(self.catalog.search(created=(None, yesterday))) == 0
+        assert len(self.catalog.search(changed=(yesterday, None))) == 8
+
+    def test_rename_and_remove(self):
+
+        self.f0.rename_content("f1", "f2")
+
+        assert self.catalog.get_object(".f0.f1.y1") is None
+        assert self.catalog.get_object(".f0.f2.y1").id == "y1"
+
+        self.f0.remove_content("f2")
+
+        assert len(self.catalog) == 4
+        assert len(self.catalog.search(path=".f0.f2")) == 0
+
+    def test_move(self):
+
+        events = []
+        self.config.add_subscriber(events.append, IObjectPathChangedEvent)
+
+        target = BaseFolder("target")
+        self.root.add_content(target)
+
+        sub = BaseFolder("sub")
+        self.f0.add_content(sub)
+        sub.add_content(BaseContent("z0"))
+
+        assert self.f0.move_content_to("sub", target)
+        assert "sub" not in self.f0
+        assert "sub" in target._list_content_ids()
+        assert sub.__parent__ is target
+
+        assert len(events) == 1
+        assert events[0].old_path == ".f0.sub"
+        assert events[0].new_path == ".target.sub"
+        assert events[0].old_parent is self.f0
+
+        assert self.catalog.get_object(".f0.sub.z0") is None
+        assert self.catalog.get_object(".target.sub.z0").id == "z0"
+        assert sub.get_content("z0").dottedpath == ".target.sub.z0"
+
+        try:
+            self.root.move_content_to("target", sub)
+            assert False
+        except ValueError:
+            pass
+
+    def test_without_events(self):
+
+        removed = []
+        self.config.add_subscriber(removed.append, IObjectRemovedEvent)
+
+        folder = BaseFolder("quiet")
+        self.root.add_content(folder, emit_event=False)
+        folder.add_content_many(
+            [BaseFolder("a"), BaseContent("b"), BaseContent("c")], emit_event=False
+        )
+        folder.get_content("a").add_content(BaseContent("d"), emit_event=False)
+
+        assert self.catalog.get_object(".quiet.a.d").id == "d"
+
+        folder.rename_content("a", "a2", emit_event=False)
+        folder.remove_content_many(["b"], emit_event=False)
+
+        assert self.catalog.get_object(".quiet.a") is None
+        assert self.catalog.get_object(".quiet.a2.d").id == "d"
+        assert self.catalog.get_object(".quiet.b") is None
+
+        # the catalog gives the same result, in the same order, as a walk
+        folder.set_order(["c", "a2"])
+        found = folder.find_content()
+        assert [obj.id for obj in found] == ["c", "a2", "d"]
+        assert found == list(folder.iter_content(deactivate=False))
+
+        self.root.remove_content("quiet")
+
+        assert [event.object.id for event in removed] == ["quiet", "c", "a2", "d"]
+        assert len(self.catalog.search(path=".quiet")) == 0
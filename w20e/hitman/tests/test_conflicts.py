@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import transaction
+from pyramid import testing
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+from w20e.hitman.models.base import BaseContent, BaseFolder, _merge_state
+
+THREADS = 4
+ROUNDS = 4
+
+
+class UnresolvedFolder(BaseFolder):
+
+    """ Folder without conflict resolution, for comparison """
+
+    def _p_resolveConflict(self, old, committed, new):
+        raise ConflictError()
+
+
+class TestConflicts(object):
+
+    def setup_method(self, method):
+        self.config = testing.setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = DB(FileStorage(os.path.join(self.tmpdir, "Data.fs")))
+
+    def teardown_method(self, method):
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+        testing.tearDown()
+
+    def add_concurrently(self, clazz):
+
+        """ Let THREADS writers add content to the same folder, committing
+        at the same time, and return the number of conflicts """
+
+        conn = self.db.open()
+        folder = clazz("folder")
+        folder.add_content(BaseContent("seed"))
+        conn.root()["folder"] = folder
+        transaction.commit()
+        conn.close()
+
+        barrier = threading.Barrier(THREADS)
+        conflicts = []
+
+        def writer(number):
+            tm = transaction.TransactionManager()
+            conn = self.db.open(tm)
+
+            for i in range(ROUNDS):
+                content_id = "x%s_%s" % (number, i)
+                waited = False
+
+                while True:
+                    tm.begin()
+                    conn.root()["folder"].add_content(BaseContent(content_id))
+
+                    if not waited:
+                        barrier.wait()
+                        waited = True
+
+                    try:
+                        tm.commit()
+                        break
+                    except ConflictError:
+                        tm.abort()
+                        conflicts.append(content_id)
+
+            conn.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(THREADS)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        conn = self.db.open()
+        folder = conn.root()["folder"]
+
+        assert len(folder) == THREADS * ROUNDS + 1
+        assert len(folder._list_content_ids()) == THREADS * ROUNDS + 1
+        assert len(list(folder._types_.ids("basecontent"))) == THREADS * ROUNDS + 1
+
+        conn.close()
+
+        return len(conflicts)
+
+    def test_concurrent_adds(self):
+
+        unresolved = self.add_concurrently(UnresolvedFolder)
+        resolved = self.add_concurrently(BaseFolder)
+
+        assert unresolved > 0
+        assert resolved < unresolved
+
+    def test_merge_state(self):
+
+        old = {"data": {"a": 1}, "_id": "f"}
+        committed = {"data": {"a": 1, "b": 2}, "_id": "f"}
+        new = {"data": {"c": 3}, "_id": "f"}
+
+        merged = _merge_state(old, committed, new, mappings=("data",))
+        assert merged == {"data": {"b": 2, "c": 3}, "_id": "f"}
+
+        try:
+            _merge_state(old, committed, {"data": {"b": 3}}, mappings=("data",))
+            assert False
+        except ConflictError:
+            pass
@@ -0,0 +1,195 @@
+import transaction
+from pyramid import testing
+from w20e.hitman.catalog import install_catalog
+from w20e.hitman.dispatch import batch_events, defer_events, notify
+from w20e.hitman.events import (
+    ContentChanged,
+    IContentEventsBatchedEvent,
+    IObjectChangedEvent,
+    IObjectEvent,
+)
+from w20e.hitman.models.base import BaseFolder, BaseContent
+from w20e.hitman.models.exceptions import UniqueConstraint
+
+
+class TestDispatch(object):
+
+    def setup_method(self, method):
+        self.config = testing.setUp()
+        self.config.include("w20e.hitman.catalog")
+
+        self.events = []
+        self.batches = []
+        self.config.add_subscriber(self.events.append, IObjectEvent)
+        self.config.add_subscriber(self.batches.append, IContentEventsBatchedEvent)
+
+        self.root = BaseFolder("root")
+        self.catalog = install_catalog(self.root)
+
+    def teardown_method(self, method):
+        transaction.abort()
+        testing.tearDown()
+
+    def test_batch(self):
+
+        x0 = BaseContent("x0")
+
+        with batch_events():
+            self.root.add_content(x0)
+
+            for i in range(10):
+                notify(ContentChanged(x0, fields=["f%s" % (i % 2)]))
+
+            assert self.events == []
+
+        assert [e.__class__.__name__ for e in self.events] == [
+            "ContentAdded",
+            "ContentChanged",
+        ]
+        assert len(self.batches) == 1
+        assert len(self.batches[0].events) == 2
+        assert self.events[1].fields == frozenset(["f0", "f1"])
+
+        with batch_events():
+            notify(ContentChanged(x0, fields=["f0"]))
+            notify(ContentChanged(x0))
+
+        assert self.events[2].fields is None
+
+    def test_nested_and_failed_batch(self):
+
+        with batch_events():
+            with batch_events():
+                self.root.add_content(BaseContent("x0"))
+
+            assert self.events == []
+
+        assert len(self.events) == 1
+        assert len(self.batches) == 1
+
+        try:
+            with batch_events():
+                self.root.add_content(BaseContent("x1"))
+                raise ValueError()
+        except ValueError:
+            pass
+
+        assert len(self.events) == 1
+
+        # nested batches keep their own dispatch setting
+        with batch_events():
+            self.root.add_content_many([BaseContent("q0")])
+            self.root.add_content(BaseContent("q1"))
+
+        assert [e.object.id for e in self.events] == ["x0", "q1"]
+        assert [batch.dispatched for batch in self.batches[1:]] == [False, True]
+
+    def test_batch_only(self):
+
+        changed = []
+        self.config.add_subscriber(changed.append, IObjectChangedEvent)
+
+        with batch_events(dispatch_events=False):
+            self.root.add_content(BaseFolder("f0"))
+            self.root.set_order(["f0"])
+
+        assert self.events == []
+        assert changed == []
+        assert not self.batches[0].dispatched
+
+        # the folder catalogs the content itself
+        assert self.catalog.get_object(".f0").id == "f0"
+
+    def test_defer(self):
+
+        defer_events()
+        self.root.add_content(BaseContent("x0"))
+        assert self.events == []
+
+        transaction.commit()
+        assert len(self.events) == 1
+
+        defer_events()
+        self.root.add_content(BaseContent("x1"))
+        transaction.abort()
+
+        notify(ContentChanged(self.root.get_content("x1")))
+        assert len(self.events) == 2
+
+    def bulk(self, folder):
+
+        folder.add_content(BaseContent("a"))
+        folder.add_content_many([BaseContent("b"), BaseContent("c")])
+        folder.set_order(["c", "b", "a"])
+
+    def summary(self):
+
+        # events sent one by one, and those only sent in a batch
+        dispatched = [(e.__class__.__name__, e.object.id) for e in self.events]
+        batched = [(e.__class__.__name__, e.object.id)
+                   for batch in self.batches if not batch.dispatched
+                   for e in batch.events]
+
+        return dispatched, batched
+
+    def test_defer_bulk(self):
+
+        self.bulk(self.root)
+        direct = self.summary()
+
+        del self.events[:]
+        del self.batches[:]
+
+        defer_events()
+        self.bulk(BaseFolder("other"))
+
+        assert self.events == []
+        assert self.batches == []
+
+        transaction.commit()
+
+        # the same events, only at the commit
+        assert self.summary() == direct
+        assert direct[0] == [("ContentAdded", "a")]
+
+    def test_set_order(self):
+
+        changed = []
+        self.config.add_subscriber(changed.append, IObjectChangedEvent)
+
+        for i in range(3):
+            self.root.add_content(BaseContent("x%s" % i))
+
+        self.root.set_order(["x2", "x1", "x0"])
+
+        assert changed == []
+        assert len(self.batches) == 1
+        assert len(self.batches[0].events) == 3
+
+    def test_bulk(self):
+
+        contents = [BaseContent("x%s" % i) for i in range(5)]
+        self.root.add_content_many(contents)
+
+        assert self.root._list_content_ids() == ["x0", "x1", "x2", "x3", "x4"]
+        assert contents[0].__parent__ is self.root
+        assert self.events == []
+        assert len(self.batches) == 1
+        assert len(self.batches[0].events) == 5
+        assert len(self.catalog) == 5
+
+        try:
+            self.root.add_content_many([BaseContent("y0"), BaseContent("x1")])
+            assert False
+        except UniqueConstraint:
+            pass
+
+        assert "y0" not in self.root
+
+        removed = self.root.remove_content_many(["x1", "x3", "nothere"])
+
+        assert [obj.id for obj in removed] == ["x1", "x3"]
+        assert self.root._list_content_ids() == ["x0", "x2", "x4"]
+        assert list(self.root._types_.ids("basecontent")) == ["x0", "x2", "x4"]
+        assert len(self.batches) == 2
+        assert len(self.catalog) == 3
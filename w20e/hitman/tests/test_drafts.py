@@ -0,0 +1,64 @@
+import time
+from datetime import date, datetime
+
+from pyramid import testing
+from w20e.hitman import drafts
+from w20e.hitman.drafts import ContentDrafts, Drafts, get_drafts
+from w20e.hitman.models.base import BaseContent
+
+
+class TestDrafts(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_session(self):
+
+        request = testing.DummyRequest()
+        store = get_drafts(request, BaseContent("x0"))
+
+        assert isinstance(store, Drafts)
+        assert store.get(".x0") is None
+
+        data = {"name": "x", "born": date(2000, 1, 2),
+                "seen": datetime(2020, 1, 2, 3, 4, 5)}
+        store.set(".x0", data)
+
+        assert ".x0" in store
+        assert Drafts(request).get(".x0") == data
+        assert isinstance(request.session[drafts.SESSION_KEY][".x0"][1], str)
+
+        # stale drafts are ignored
+        assert Drafts(request, max_age=-1).get(".x0") is None
+
+        store.remove(".x0")
+        assert store.get(".x0") is None
+
+    def test_no_session(self):
+
+        content = BaseContent("x0")
+        store = get_drafts(object(), content)
+
+        assert isinstance(store, ContentDrafts)
+
+        store.set(".x0", {"name": "x"})
+        assert content._cloned_data == {"name": "x"}
+        assert ContentDrafts(content).get(".x0") == {"name": "x"}
+
+        store.remove(".x0")
+        assert not hasattr(content, "_cloned_data")
+
+    def test_cleanup(self):
+
+        request = testing.DummyRequest()
+        store = Drafts(request)
+        store.set(".x0", {})
+
+        store._drafts[".x0"][0] = time.time() - 2 * drafts.MAX_AGE
+        store.set(".x1", {})
+
+        assert ".x0" not in store._drafts
+        assert store.cleanup(max_age=-1) == 1
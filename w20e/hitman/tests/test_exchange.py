@@ -0,0 +1,99 @@
+import datetime
+import io
+import json
+
+import transaction
+from pyramid import testing
+from ZODB.blob import Blob
+from w20e.hitman.catalog import install_catalog
+from w20e.hitman.exchange import export_content, import_content
+from w20e.hitman.models import Registry
+from w20e.hitman.models.base import BaseContent, BaseFolder, BTreeFolder
+
+
+class TestExchange(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+        self.config.include("w20e.hitman.catalog")
+        Registry.register("btreefolder", BTreeFolder)
+
+        self.root = BaseFolder("root")
+        self.root.add_content(BTreeFolder("f0"))
+        self.f0 = self.root.get_content("f0")
+
+        for i in range(5):
+            self.f0.add_content(BaseContent("x%s" % i))
+
+        self.f0.add_content(BaseFolder("f1"))
+        self.f0.get_content("f1").add_content(BaseContent("y0"))
+        self.f0.move_content("x4", -4)
+
+        x1 = self.f0.get_content("x1")
+        x1.set_attribute("title", "X1")
+        x1.set_attribute("date", datetime.date(2020, 1, 2))
+        x1.owner = "tester"
+
+        # file containers, as w20e.forms stores them, can't be exported
+        x1.set_attribute("file", {"name": "x1.txt", "data": Blob()})
+
+    def teardown_class(self):
+        del Registry.content_types["btreefolder"]
+        transaction.abort()
+        testing.tearDown()
+
+    def test_export_import(self):
+
+        stream = io.StringIO()
+
+        assert export_content(self.root, stream) == 8
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+        assert lines[0]["path"] == ["f0"]
+        assert lines[0]["type"] == "btreefolder"
+        assert lines[1]["path"] == ["f0", "x4"]
+        assert lines[-1]["path"] == ["f0", "f1", "y0"]
+        x1_line = [line for line in lines if line["path"] == ["f0", "x1"]][0]
+        assert x1_line["skipped"] == ["file"]
+        assert "file" not in x1_line["data"]
+
+        target = BaseFolder("target")
+        catalog = install_catalog(target)
+        stream.seek(0)
+
+        assert import_content(target, stream, savepoint_every=3) == 8
+
+        f0 = target.get_content("f0")
+        x1 = f0.get_content("x1")
+
+        assert isinstance(f0, BTreeFolder)
+        assert f0._list_content_ids() == self.f0._list_content_ids()
+        assert x1._data_["title"] == "X1"
+        assert x1._data_["date"] == datetime.date(2020, 1, 2)
+        assert x1.owner == "tester"
+        assert x1.created == self.f0.get_content("x1").created
+        assert f0.get_content("f1").get_content("y0").dottedpath == ".f0.f1.y0"
+        assert catalog.get_object(".f0.f1.y0") is not None
+
+    def test_import_refuses(self):
+
+        target = BaseFolder("target")
+
+        for line in [
+            {"path": ["echo x"], "type": "os.system"},
+            {"path": ["x"], "type": "w20e.hitman.models.base.notthere"},
+            {"path": ["x"], "type": "w20e.hitman.models.base.Base"},
+            {"path": ["../x"], "type": "w20e.hitman.models.base.BaseContent"},
+            {"path": ["_p_jar"], "type": "w20e.hitman.models.base.BaseContent"},
+        ]:
+            line.update({"data": {}, "owner": None, "created": None,
+                         "changed": None})
+
+            try:
+                import_content(target, io.StringIO(json.dumps(line)))
+                assert False
+            except ValueError:
+                pass
+
+        assert len(target) == 0
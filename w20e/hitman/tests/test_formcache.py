@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import weakref
+
+from pyramid import testing
+from pyramid.config import Configurator
+from w20e.hitman.formcache import FormCache, form_cache
+from w20e.hitman.models import Registry
+from w20e.hitman.models.base import BaseContent
+from w20e.hitman.models.exceptions import InvalidForm
+
+
+class TestContent(BaseContent):
+    """ implementation of the BaseContent class just for testing """
+
+    edit_form = 'test_content_form.xml'
+
+
+class OtherContent(BaseContent):
+    """ another class, using the same form """
+
+    edit_form = 'test_content_form.xml'
+
+
+class TestFormCache(object):
+
+    def test_cache(self):
+
+        cache = FormCache(maxsize=1)
+
+        form1 = cache.get_form(TestContent)
+        form2 = cache.get_form(TestContent)
+
+        assert cache.misses == 1
+        assert cache.hits == 1
+        assert form1 is not form2
+        assert form1.data is not form2.data
+        assert form1.view is form2.view
+
+        form1.data['name'] = 'changed'
+        assert form2.data['name'] is None
+
+        cache.get_form(OtherContent)
+        assert cache.misses == 2
+        assert len(cache) == 1
+
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_changed_file(self):
+
+        tmpdir = tempfile.mkdtemp()
+        src = os.path.join(os.path.dirname(__file__), 'test_content_form.xml')
+        form_file = os.path.join(tmpdir, 'form.xml')
+        shutil.copy(src, form_file)
+
+        try:
+            cache = FormCache()
+            cache.get_form(TestContent, form_file)
+
+            mtime = os.path.getmtime(form_file)
+            os.utime(form_file, (mtime + 10, mtime + 10))
+
+            cache.get_form(TestContent, form_file)
+
+            assert cache.misses == 2
+            assert len(cache) == 1
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_template(self):
+
+        cache = FormCache()
+        template = cache.get_template(TestContent)
+
+        assert cache.get_template(TestContent) is template
+        assert isinstance(template.defaults, tuple)
+
+        form = template.new_form()
+        form.data['name'] = 'changed'
+
+        assert dict(template.defaults)['name'] is None
+        assert template.new_form().data['name'] is None
+        assert form.view is template.view
+
+    def test_form_per_request(self):
+
+        obj = TestContent("x")
+        request1 = testing.DummyRequest()
+        request2 = testing.DummyRequest()
+
+        form = obj._form_(request1)
+
+        assert obj._form_(request1) is form
+        assert obj._form_(request2) is not form
+
+        # the request is not kept alive by the object
+        ref = weakref.ref(request2)
+        del request2
+        assert ref() is None
+
+    def test_warmup(self):
+
+        form_cache.clear()
+        Registry.register("testcontent", TestContent)
+
+        try:
+            assert len(form_cache) == 1
+
+            timings = Registry.warmup(validate=True)
+
+            # the time the form took to parse when it was registered
+            assert form_cache.misses == 1
+            assert timings["testcontent"] > 0
+            assert timings["testcontent"] == form_cache.get_template(
+                TestContent).seconds
+
+            form_cache.clear()
+            config = Configurator(settings={"hitman.warmup.validate": "true"})
+            config.include("w20e.hitman")
+            config.make_wsgi_app()
+
+            assert len(form_cache) == 1
+        finally:
+            del Registry.content_types["testcontent"]
+
+    def test_validate(self):
+
+        tmpdir = tempfile.mkdtemp()
+        src = os.path.join(os.path.dirname(__file__), 'test_content_form.xml')
+        form_file = os.path.join(tmpdir, 'form.xml')
+
+        with open(src) as f:
+            xml = f.read().replace('bind="keywords"', 'bind="kw"')
+
+        with open(form_file, 'w') as f:
+            f.write(xml)
+
+        class BrokenContent(BaseContent):
+
+            edit_form = form_file
+
+        Registry.register("brokencontent", BrokenContent, compile_form=False)
+
+        try:
+            Registry.warmup()
+
+            try:
+                Registry.warmup(validate=True)
+                assert False
+            except InvalidForm as e:
+                assert "kw" in str(e)
+        finally:
+            del Registry.content_types["brokencontent"]
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,43 @@
+from pyramid import testing
+from w20e.hitman.models.base import BaseFolder, BaseContent, IFolder
+
+
+class TestContentTypeIndex(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+        self.root = BaseFolder("root")
+        self.f0 = BaseFolder("f0")
+        self.root.add_content(self.f0)
+
+        for i in range(3):
+            self.root.add_content(BaseContent("x%s" % i))
+            self.f0.add_content(BaseContent("y%s" % i))
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_index(self):
+
+        index = self.root._types_
+
+        assert set(index.ids("basecontent")) == set(["x0", "x1", "x2"])
+        assert list(index.ids("basefolder")) == ["f0"]
+        assert list(index.folder_ids()) == ["f0"]
+
+        self.root.rename_content("x1", "z1")
+        assert index.content_type("z1") == "basecontent"
+        assert index.content_type("x1") is None
+
+        self.root.remove_content("z1")
+        assert set(index.ids("basecontent")) == set(["x0", "x2"])
+
+        assert [obj.id for obj in self.root.list_content(iface=IFolder)] == ["f0"]
+        assert len(self.root.find_content(content_type="basecontent")) == 5
+
+    def test_build_missing_index(self):
+
+        del self.f0._type_index
+
+        assert set(self.f0._types_.ids("basecontent")) == set(["y0", "y1", "y2"])
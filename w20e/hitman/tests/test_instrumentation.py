@@ -0,0 +1,100 @@
+import transaction
+from pyramid import testing
+from pyramid.response import Response
+from w20e.hitman import instrumentation
+from w20e.hitman.events import IObjectEvent
+from w20e.hitman.formcache import form_cache
+from w20e.hitman.instrumentation import instrumentation_tween_factory
+from w20e.hitman.models.base import BaseContent, BaseFolder
+from ZODB import DB
+from ZODB.MappingStorage import MappingStorage
+
+
+class TestContent(BaseContent):
+    """ implementation of the BaseContent class just for testing """
+
+    edit_form = 'test_content_form.xml'
+
+
+def added(event):
+    pass
+
+
+class TestInstrumentation(object):
+
+    def setup_method(self, method):
+        self.config = testing.setUp(settings={
+            "hitman.instrumentation": "true",
+            "hitman.instrumentation.headers": "true",
+        })
+        self.config.add_subscriber(added, IObjectEvent)
+
+    def teardown_method(self, method):
+        testing.tearDown()
+
+    def handler(self, request):
+
+        folder = BaseFolder("root")
+        folder.add_content(TestContent("x0"))
+        folder.get_content("x0")._form_(request)
+
+        return Response("ok")
+
+    def test_tween(self):
+
+        form_cache.clear()
+        tween = instrumentation_tween_factory(self.handler, self.config.registry)
+        response = tween(testing.DummyRequest())
+
+        assert response.headers["X-Hitman-Events"] == "1"
+        assert response.headers["X-Hitman-Event-Times"].startswith("ContentAdded=")
+        assert "test_instrumentation.added=" in response.headers[
+            "X-Hitman-Subscriber-Times"]
+        assert response.headers["X-Hitman-Form-Misses"] == "1"
+        assert instrumentation.current() is None
+
+    def test_stats(self):
+
+        stats = instrumentation.start()
+
+        try:
+            self.handler(testing.DummyRequest())
+        finally:
+            instrumentation.stop()
+
+        data = stats.as_dict()
+
+        assert data["events"] == {"ContentAdded": 1}
+        assert list(data["event_seconds"]) == ["ContentAdded"]
+        assert list(data["subscribers"].values()) == [1]
+        assert list(data["subscriber_seconds"]) == list(data["subscribers"])
+        assert data["form_hits"] + data["form_misses"] == 1
+
+    def test_loads(self):
+
+        db = DB(MappingStorage())
+        conn = db.open()
+        conn.root()["root"] = BaseFolder("root")
+        conn.root()["root"].add_content(BaseContent("x0"))
+        transaction.commit()
+        conn.close()
+        db.cacheMinimize()
+
+        instrumentation.instrument_loads()
+        conn = db.open()
+        stats = instrumentation.start()
+
+        try:
+            conn.root()["root"].get_content("x0").id
+        finally:
+            instrumentation.stop()
+            conn.close()
+            db.close()
+
+        assert stats.loads >= 2
+        assert stats.load_seconds > 0
+
+    def test_off(self):
+
+        registry = testing.setUp().registry
+        assert instrumentation_tween_factory(self.handler, registry) == self.handler
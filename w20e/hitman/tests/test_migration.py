@@ -0,0 +1,87 @@
+from pyramid import testing
+from w20e.hitman.catalog import install_catalog
+from w20e.hitman.models.base import BaseFolder, BaseContent, BTreeFolder
+from w20e.hitman.models.migration import migrate_folder, migrate_folders
+
+
+class TestBTreeFolder(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_btreefolder(self):
+
+        folder = BTreeFolder("f")
+
+        for i in range(5):
+            folder.add_content(BaseContent("x%s" % i))
+
+        assert len(folder) == 5
+        assert "x3" in folder
+        assert folder.get_content("x3").id == "x3"
+        assert [obj.id for obj in folder.list_content()][:2] == ["x0", "x1"]
+
+        folder.move_content("x4", -4)
+        assert folder._list_content_ids()[0] == "x4"
+
+        folder.rename_content("x2", "y2")
+        assert "y2" in folder and "x2" not in folder
+        assert folder.generate_content_id("x0") == "x0_1"
+
+        folder.remove_content("x0")
+        assert len(folder) == 4
+
+        folder.add_content_many([BaseContent("z0"), BaseContent("z1")])
+        assert len(folder) == 6
+        assert folder
+        assert not BTreeFolder("empty") is None
+
+
+class TestMigration(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+        self.config.include("w20e.hitman.catalog")
+
+        self.root = BaseFolder("root")
+        self.root.add_content(BaseFolder("f0"))
+        self.f0 = self.root.get_content("f0")
+        self.f0.add_content(BaseFolder("f1"))
+
+        for i in range(3):
+            self.f0.add_content(BaseContent("x%s" % i))
+            self.f0.get_content("f1").add_content(BaseContent("y%s" % i))
+
+        self.f0.move_content("x2", -3)
+        self.f0.set_attribute("title", "F0")
+        self.catalog = install_catalog(self.root)
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_migrate(self):
+
+        ids = self.f0._list_content_ids()
+
+        assert migrate_folders(self.root) == 2
+
+        f0 = self.root.get_content("f0")
+        assert isinstance(f0, BTreeFolder)
+        assert f0 is not self.f0
+        assert f0._list_content_ids() == ids
+        assert f0._data_["title"] == "F0"
+        assert f0.get_content("x1").__parent__ is f0
+        assert isinstance(f0.get_content("f1"), BTreeFolder)
+        assert f0.get_content("f1").get_content("y2").dottedpath == ".f0.f1.y2"
+
+        assert self.catalog.get_object(".f0") is f0
+        assert list(self.root._types_.ids("btreefolder")) == ["f0"]
+
+        try:
+            migrate_folder(f0.get_content("x1"))
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,90 @@
+from pyramid import testing
+from w20e.hitman.models.base import BaseFolder, BaseContent
+from w20e.hitman.models.order import ChildOrder
+
+
+class TestChildOrder(object):
+
+    def test_append_remove(self):
+
+        order = ChildOrder(["a", "b", "c"])
+
+        assert list(order) == ["a", "b", "c"]
+        assert len(order) == 3
+        assert "b" in order
+        assert order.index("c") == 2
+
+        order.append("b")
+        assert list(order) == ["a", "b", "c"]
+
+        order.remove("b")
+        assert list(order) == ["a", "c"]
+        assert len(order) == 2
+        assert "b" not in order
+
+        try:
+            order.remove("b")
+            assert False
+        except ValueError:
+            pass
+
+    def test_rename(self):
+
+        order = ChildOrder(["a", "b", "c"])
+        order.rename("b", "x")
+
+        assert list(order) == ["a", "x", "c"]
+
+    def test_move(self):
+
+        order = ChildOrder(["a", "b", "c", "d"])
+
+        order.move("c", -1)
+        assert list(order) == ["a", "c", "b", "d"]
+
+        order.move("a", 2)
+        assert list(order) == ["c", "b", "a", "d"]
+
+        order.move("b", -10)
+        assert list(order) == ["b", "c", "a", "d"]
+
+        order.move("c", 10)
+        assert list(order) == ["b", "a", "d", "c"]
+
+    def test_renumber(self):
+
+        order = ChildOrder(["a", "b"])
+
+        # keep squeezing into the same gap until it's used up
+        for i in range(40):
+            order.append("n%s" % i)
+            order.move("n%s" % i, -(i + 1))
+
+        assert list(order)[:2] == ["a", "n39"]
+        assert list(order)[-1] == "b"
+        assert len(order) == 42
+
+
+class TestFolderOrder(object):
+
+    def setup_class(self):
+        self.config = testing.setUp()
+
+    def teardown_class(self):
+        testing.tearDown()
+
+    def test_migrate_list(self):
+
+        folder = BaseFolder("f")
+
+        for content_id in ["x", "y", "z"]:
+            folder.add_content(BaseContent(content_id))
+
+        # folders stored by older versions hold a list
+        folder._order = ["z", "x"]
+
+        assert folder._list_content_ids() == ["z", "x", "y"]
+        assert isinstance(folder._order, ChildOrder)
+
+        folder.move_content("x", -1)
+        assert folder._list_content_ids() == ["x", "z", "y"]
@@ -0,0 +1,62 @@
+import io
+import time
+
+from pyramid import testing
+from w20e.hitman.events import IObjectAddedEvent, IObjectEvent
+from w20e.hitman.models.base import BaseContent, BaseFolder
+from w20e.hitman.profiling import disable_profiling, enable_profiling, get_profile
+
+
+def fast(event):
+    pass
+
+
+def slow(event):
+    time.sleep(0.01)
+
+
+class TestProfiling(object):
+
+    def setup_method(self, method):
+        self.config = testing.setUp()
+        self.config.add_subscriber(fast, IObjectEvent)
+        self.config.add_subscriber(slow, IObjectAddedEvent)
+
+    def teardown_method(self, method):
+        disable_profiling()
+        testing.tearDown()
+
+    def test_profile(self):
+
+        profile = enable_profiling(threshold=0.005)
+        folder = BaseFolder("root")
+
+        for i in range(3):
+            folder.add_content(BaseContent("x%s" % i))
+
+        folder.remove_content("x0")
+
+        report = profile.report()
+
+        assert report[0]["subscriber"].endswith("test_profiling.slow")
+        assert report[0]["interface"] == "IObjectAddedEvent"
+        assert report[0]["calls"] == 3
+        assert report[0]["p95"] >= 0.01
+        assert len(report) == 3
+
+        stream = io.StringIO()
+        profile.dump(stream)
+        assert "test_profiling.fast" in stream.getvalue()
+
+        profile.reset()
+        assert profile.report() == []
+
+    def test_includeme(self):
+
+        config = testing.setUp(settings={
+            "hitman.profiling": "true",
+            "hitman.profiling.threshold": "100",
+        })
+        config.include("w20e.hitman.profiling")
+
+        assert get_profile().threshold == 0.1
@@ -1,7 +1,10 @@
+import subprocess
+import sys
 
 from pyramid import testing
 from w20e.hitman.models.base import BaseFolder, BaseContent
-from w20e.hitman.utils import object_to_path, path_to_object
+from w20e.hitman.catalog import install_catalog
+from w20e.hitman.utils import normalize_id, object_to_path, path_to_object
 
 
 class TestUtils(object):
@@ -35,3 +38,68 @@ class TestUtils(object):
     def test_path_to_object(self):
 
         assert self.x0 == path_to_object("/f0/x0", self.root)
+
+    def test_cached_path(self):
+
+        f2 = BaseFolder("f2")
+        f2.add_content(BaseContent("x2"))
+        x2 = f2.get_content("x2")
+
+        assert "/x2" == object_to_path(x2)
+        assert x2.root is f2
+
+        self.root.add_content(f2)
+        assert "/f2/x2" == object_to_path(x2)
+        assert x2.root is self.root
+
+        self.root.rename_content("f2", "f3")
+        assert "/f3/x2" == object_to_path(x2)
+        assert ".f3.x2" == x2.dottedpath
+
+        self.root.get_content("f3").set_id("f4")
+        assert "/f4/x2" == object_to_path(x2)
+        self.root.get_content("f3").set_id("f3")
+
+    def test_path_to_object_catalog(self):
+
+        install_catalog(self.root)
+
+        assert self.x1 == path_to_object("/f0/x1", self.root)
+        assert self.x1 == path_to_object(".f0.x1", self.root, path_sep=".")
+        assert path_to_object("/f0/nothere", self.root) is None
+
+        # the catalog doesn't have to be current
+        f4 = BaseFolder("f4")
+        self.root.add_content(f4)
+        f4.add_content(BaseFolder("a"))
+        f4.get_content("a").add_content(BaseContent("b"))
+        install_catalog(self.root)
+
+        a = f4["a"]
+        del f4["a"]
+        a._id = a.__name__ = "a2"
+        f4["a2"] = a
+
+        assert path_to_object("/f4/a/b", self.root) is None
+        assert path_to_object("/f4/a2/b", self.root).id == "b"
+
+        del self.root._catalog
+
+    def test_normalize_id(self):
+
+        normalize_id.cache_clear()
+
+        assert normalize_id("document-1") == "document-1"
+        assert normalize_id("Dôcument 1") == "document-1"
+        assert normalize_id("document_1") == "document-1"
+        assert normalize_id("Dôcument 1") == "document-1"
+        assert normalize_id.cache_info().hits == 1
+        assert normalize_id("abc\n") == "abc"
+
+    def test_import(self):
+
+        # importing a module doesn't load the models through the package
+        code = ("import sys, w20e.hitman.utils; "
+                "assert 'w20e.hitman.models' not in sys.modules")
+
+        subprocess.check_call([sys.executable, "-c", code])
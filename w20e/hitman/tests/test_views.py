@@ -5,6 +5,7 @@ from pyramid.httpexceptions import HTTPFound
 from w20e.hitman.models.base import BaseFolder, BaseContent
 from w20e.hitman.views import base
 from w20e.hitman.models import Registry
+from w20e.hitman.events import IObjectChangedEvent
 import datetime
 
 class TestContent(BaseContent):
@@ -13,6 +14,17 @@ class TestContent(BaseContent):
     edit_form = 'test_content_form.xml'
 
 
+class CountingContent(TestContent):
+    """ content that counts its instances """
+
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+
+        CountingContent.instances += 1
+        TestContent.__init__(self, *args, **kwargs)
+
+
 class TestUtils(object):
 
     def setup_class(self):
@@ -57,6 +69,23 @@ class TestUtils(object):
         field_labels = set([f['label'] for f in fields])
         assert labels ^ field_labels == set([])
 
+    def test_view_list_fields_cached(self):
+
+        view = base.ContentView(self.x0, testing.DummyRequest())
+        fields = view.list_fields()
+
+        fields[0]['value'] = 'changed'
+
+        view = base.ContentView(self.x0, testing.DummyRequest())
+        assert view.list_fields()[0]['value'] != 'changed'
+        assert self.x0._v_fields[1][0]['value'] != 'changed'
+
+        self.x0.set_attribute('keywords', 'foo')
+
+        view = base.ContentView(self.x0, testing.DummyRequest())
+        fields = dict([(f['label'], f['raw']) for f in view.list_fields()])
+        assert fields['Keywords'] == 'foo'
+
     def test_DelView(self):
 
         request = testing.DummyRequest()
@@ -92,6 +121,10 @@ class TestUtils(object):
 
         view = base.EditView(self.x0, request)
 
+        # single page forms are not cloned
+        assert not view.multipage
+        assert not hasattr(self.x0, '_cloned_data')
+
         assert view.content_type == 'testcontent'
         assert view.after_edit_redirect == 'http://example.com/root/f0/x0/'
 
@@ -106,6 +139,9 @@ class TestUtils(object):
         assert self.x0._data_['name'] is None
 
         # submit form with name
+        events = []
+        self.config.add_subscriber(events.append, IObjectChangedEvent)
+
         name = "Gëllo, I'm x0"
         request.params['name'] = name
         view = base.EditView(self.x0, request)
@@ -113,6 +149,36 @@ class TestUtils(object):
         assert isinstance(result, HTTPFound)
         assert result.location == 'http://example.com/root/f0/x0/'
         assert self.x0._data_['name'] == name
+        assert 'name' in events[-1].fields
+
+        # nothing changes when submitting the same data again
+        view = base.EditView(self.x0, request)
+        view()
+        assert events[-1].fields == frozenset()
+
+    def test_EditView_draft(self):
+
+        class MultipageEditView(base.EditView):
+
+            multipage = True
+
+        request = testing.DummyRequest()
+        view = MultipageEditView(self.x1, request)
+
+        # a draft holds the changed fields only
+        view.form.data['name'] = "from page 1"
+        view.drafts.set(view.draft_key, view.draft_data())
+        assert view.drafts.get(view.draft_key) == {'name': "from page 1"}
+
+        request = testing.DummyRequest(post={}, session=request.session)
+        view = MultipageEditView(self.x1, request)
+        assert view.form.data['name'] == "from page 1"
+        assert self.x1._data_['name'] != "from page 1"
+
+        # a new visit of the form starts over
+        request = testing.DummyRequest(session=request.session)
+        view = MultipageEditView(self.x1, request)
+        assert view.drafts.get(view.draft_key) is None
 
     def test_AddView(self):
 
@@ -150,3 +216,25 @@ class TestUtils(object):
         content = self.f1.list_content(content_type='testcontent')
         assert len(content) == 1
         assert content[0]._data_['name'] == name
+
+    def test_AddView_instances(self):
+
+        Registry.register('countingcontent', CountingContent)
+
+        request = testing.DummyRequest()
+        request.application_url = 'http://example.com/'
+        request.params['ctype'] = 'countingcontent'
+
+        view = base.AddView(self.f1, request)
+        view()
+        assert CountingContent.instances == 0
+
+        request.params['w20e.forms.process'] = 1
+        request.params['name'] = 'counted'
+        view = base.AddView(self.f1, request)
+        assert isinstance(view(), HTTPFound)
+        assert CountingContent.instances == 1
+
+        request = testing.DummyRequest()
+        request.application_url = 'http://example.com/'
+        assert isinstance(base.AddView(self.f1, request)(), HTTPFound)
@@ -1,3 +1,14 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+from BTrees.Length import Length
+from slugify import slugify
+
+# ids that slugify would return unchanged
+SLUG = re.compile(r"[a-z0-9]+(-[a-z0-9]+)*")
+
+
 def path_to_object(path, root, path_sep="/"):
 
     """ Given a path, return the object from the hierarchy """
@@ -26,20 +37,111 @@ def object_to_path(obj, path_sep="/", as_list=False):
 
     """ Give an object, return the path """
 
-    path = [obj._id]
-
-    _root = obj
-
-    while getattr(_root, "__parent__", None) is not None:
-        _root = _root.__parent__
-        path.append(_root.id)
-
-    path.reverse()
+    path = list(_path_info(obj)[1])
 
     if as_list:
-        return path[1:]
+        return path
     else:
-        value = path_sep.join([''] + path[1:])
+        value = path_sep.join([''] + path)
         if not value.startswith(path_sep):
             value = path_sep + value
         return value
+
+
+def object_to_root(obj):
+
+    """ Give an object, return the root of its hierarchy """
+
+    return _path_info(obj)[0]
+
+
+def path_generation(root):
+
+    """ Return the path generation of the hierarchy under root """
+
+    counter = getattr(root, "_path_generation", None)
+
+    if counter is None:
+        return 0
+
+    return counter()
+
+
+def invalidate_paths(obj):
+
+    """ Invalidate all cached paths in the hierarchy obj is in. Call
+    this whenever existing content gets another path """
+
+    root = object_to_root(obj)
+    counter = getattr(root, "_path_generation", None)
+
+    if counter is None:
+        root._path_generation = Length(1)
+    else:
+        counter.change(1)
+
+
+def _path_info(obj):
+
+    """ Return the root and the path of obj as tuple of id's. The result
+    is kept in the volatile _v_path attribute, that is valid for as long
+    as the path generation of the root doesn't change. Parents are
+    asked for their path in the same way, so siblings share the walk."""
+
+    try:
+        root, generation, path = obj._v_path
+        if path_generation(root) == generation:
+            return root, path
+    except AttributeError:
+        pass
+
+    parent = getattr(obj, "__parent__", None)
+
+    if parent is None or parent is obj:
+        root, path = obj, ()
+    else:
+        root, path = _path_info(parent)
+        path = path + (obj.id,)
+
+    obj._v_path = (root, path_generation(root), path)
+
+    return root, path
+
+
+@lru_cache(maxsize=1024)
+def normalize_id(id):
+
+    """ Return id as a slug. Ids that are slugs already skip slugify, the
+    results for others are kept in a bounded cache """
+
+    if SLUG.fullmatch(id):
+        return id
+
+    return slugify(id)
+
+
+def json_encode(value):
+
+    """ Default for json.dumps, tagging the dates and datetimes that form
+    data may hold """
+
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+
+    raise TypeError("can't encode %r" % (value,))
+
+
+def json_decode(obj):
+
+    """ Object hook for json.loads, the reverse of json_encode """
+
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+
+    return obj
@@ -4,7 +4,10 @@ from w20e.hitman.models import Registry
 from w20e.forms.pyramid.formview import formview as pyramidformview
 from pyramid.url import resource_url
 from datetime import datetime
+from ..dispatch import notify
+from ..drafts import get_drafts
 from ..events import ContentChanged
+from ..formcache import field_info
 
 
 class BaseView(object):
@@ -47,6 +50,15 @@ class BaseView(object):
         except:
             return []
 
+    def batch_content(self, **kwargs):
+
+        """ Lazy listing, see BaseFolder.batch_content """
+
+        try:
+            return self.context.batch_content(**kwargs)
+        except:
+            return []
+
     @property
     def content_type(self):
 
@@ -67,6 +79,9 @@ class ContentView(BaseView, pyramidformview):
 
     """ Helper class for finding parents, URL's, etc. """
 
+    # keep list_fields on the context, per version of the context
+    cache_fields = True
+
     def __init__(self, context, request, form=None):
 
         BaseView.__init__(self, context, request)
@@ -81,27 +96,37 @@ class ContentView(BaseView, pyramidformview):
 
     def list_fields(self):
 
-        """ Return fields as dict {name, lexical value} """
+        """ Return fields as dict {name, lexical value}. Labels and types
+        are computed once per form, the values once per version of the
+        context; callers get copies of the cached dicts """
 
-        fields = []
+        changed = getattr(self.context, "_changed", None)
+        cache = self.cache_fields and changed is not None
+
+        if cache:
+            try:
+                version, fields = self.context._v_fields
 
-        for field in self.form.data.getFields():
+                if version == changed:
+                    return [dict(field) for field in fields]
+            except:
+                pass
+
+        fields = []
 
-            val = self.form.getFieldValue(field, lexical=True)
-            raw = self.form.getFieldValue(field, lexical=False)
-            label = None
-            renderable = self.form.view.getRenderableByBind(field)
+        for field, label, type in field_info(self.form):
 
-            if renderable:
-                label = renderable.label
+            fields.append({'label': label,
+                           'value': self.form.getFieldValue(
+                               field, lexical=True),
+                           'type': type,
+                           'raw': self.form.getFieldValue(
+                               field, lexical=False)})
 
-            if label:
-                fields.append({'label': label,
-                               'value': val,
-                               'type': renderable.type,
-                               'raw': raw})
+        if cache:
+            self.context._v_fields = (changed, fields)
 
-        return fields
+        return [dict(field) for field in fields]
 
 
 class DelView(BaseView):
@@ -132,19 +157,54 @@ class EditView(ContentView):
 
     """ Generic edit form """
 
+    # the form may hold data that is not stored yet
+    cache_fields = False
+
     def __init__(self, context, request):
 
         ContentView.__init__(self, context, request)
 
-        # Clone the data, in case of a multi-page form. Only submit the
-        # data when the form is completed
-        if self.request.method == 'GET':
-            _cloned_data = context._cloned_data = self.form.data.as_dict()
-        elif self.request.method == 'POST':
-            _cloned_data = getattr(context, '_cloned_data', None)
-        if not _cloned_data:
-            _cloned_data = context._cloned_data = self.form.data.as_dict()
-        self.form.data.from_dict(_cloned_data)
+        # the data as stored, to find the changed fields on completion
+        self.stored_data = context._data_
+        self.drafts = None
+
+        # In case of a multi-page form, only submit the data when the
+        # form is completed. Until then, the fields changed on earlier
+        # pages are kept as a draft, in the session if there is one
+        if self.multipage:
+            self.drafts = get_drafts(request, context)
+            self.draft_key = context.dottedpath
+
+            if self.request.method == 'POST':
+                draft = self.drafts.get(self.draft_key)
+
+                if draft:
+                    self.form.data.from_dict(draft)
+            else:
+                # start over
+                self.drafts.remove(self.draft_key)
+
+    @property
+    def multipage(self):
+
+        renderer = getattr(self.form.view, "renderer", None)
+
+        return bool(renderer and renderer.opts.get("multipage", False))
+
+    def changed_fields(self):
+
+        """ Names of the fields in the form that differ from the data as
+        it was stored """
+
+        return set([field for field in self.form.data.getFields()
+                    if self.form.data[field] != self.stored_data[field]])
+
+    def draft_data(self):
+
+        """ The changed fields with their values, to keep as draft """
+
+        return dict([(field, self.form.data[field])
+                     for field in self.changed_fields()])
 
     @property
     def content_type(self):
@@ -163,28 +223,31 @@ class EditView(ContentView):
         res = pyramidformview.__call__(self)
 
         if res.get('status', None) == "cancelled":
-            if hasattr(self.context, '_cloned_data'):
-                del self.context._cloned_data
-                self.context._p_changed = 1
+            if self.drafts is not None:
+                self.drafts.remove(self.draft_key)
             return HTTPFound(location=self.url)
 
         elif res.get('status', None) == "valid":
             # a page in the multipage form has been submitted. save the data
-            # in the temporary data container
-            self.context._cloned_data = self.form.data.as_dict()
-            self.context._p_changed = 1
+            # in the draft
+            if self.drafts is not None:
+                self.drafts.set(self.draft_key, self.draft_data())
 
         elif res.get('status', None) == "completed":
 
+            if self.drafts is not None:
+                self.drafts.remove(self.draft_key)
+
+            # clones stored on the content by earlier versions
             if hasattr(self.context, '_cloned_data'):
                 del self.context._cloned_data
 
+            fields = self.changed_fields()
+
             self.context._changed = datetime.now()
-            try:
-                delattr(self.context, "_v_data")
-            except:
-                pass
-            self.request.registry.notify(ContentChanged(self.context))
+            self.context._refresh_data_(fields)
+            notify(ContentChanged(self.context, fields=fields),
+                   registry=self.request.registry)
             self.context._p_changed = 1
 
             return HTTPFound(location=self.after_edit_redirect)
@@ -204,9 +267,10 @@ class AddView(BaseView, pyramidformview):
 
         clazz = Registry.get(ctype)
 
-        tmp_obj = clazz("TMP")
+        form = None
 
-        form = tmp_obj._form_(request)
+        if clazz is not None:
+            form = clazz._add_form_(request)
 
         # note: If you want to prefill the formdata, you can use
         # the _form_ override, or if in pycms, use the IFormModifier
@@ -254,6 +318,7 @@ class AddView(BaseView, pyramidformview):
 
         if status == "completed":
 
+            # the only instance, the id is set once we know the base id
             content = self.clazz("_TMP")
 
             self.form.submission.submit(self.form, content, self.request)